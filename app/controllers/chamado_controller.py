@@ -1,24 +1,52 @@
 from flask import jsonify, request
 from app.models.chamado import Chamado
-from app.services.google_sheets_service import GoogleSheetsService
+from app.services import registry
+from app.services.chamado_import import (
+    ChamadoImporter,
+    ChamadoImportError,
+    detect_format,
+    iter_csv_records,
+    iter_ndjson_records,
+)
+from app.services.normalization import ChamadosTable
 
 class ChamadoController:
-    def __init__(self):
-        self.google_sheets_service = GoogleSheetsService()
+    @property
+    def google_sheets_service(self):
+        return registry.get_google_sheets_service()
 
     def add_chamado(self):
         try:
             data = request.json
-            chamado = Chamado(
-                descricao_analista=data['descricaoAnalista'],
-                data=data['data'],
-                solicitante=data['solicitante'],
-                descricao_solicitacao=data['descricaoSolicitacao'],
-                hora_inicial=data['horaInicial'],
-                hora_final=data['horaFinal']
-            )
+            chamado = Chamado.from_dict(data)
             self.google_sheets_service.add_chamado(chamado)
             return jsonify({"message": "Chamado registrado com sucesso!"}), 201
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except Exception as e:
+            return jsonify({"error": str(e)}), 500
+
+    def import_chamados(self):
+        """
+        Importa chamados em lote a partir de um CSV ou NDJSON enviado no corpo da requisição
+        (ou como arquivo "file" em multipart/form-data). O arquivo é lido em streaming.
+        """
+        try:
+            upload = request.files.get("file") if request.mimetype == "multipart/form-data" else None
+            if upload is not None:
+                stream = upload.stream
+                file_format = detect_format(request.args.get("format"), upload.mimetype, upload.filename)
+            else:
+                stream = request.stream
+                file_format = detect_format(request.args.get("format"), request.mimetype)
+
+            records = iter_csv_records(stream) if file_format == "csv" else iter_ndjson_records(stream)
+            summary = ChamadoImporter().import_records(records)
+            return jsonify(summary), 200
+        except ChamadoImportError as e:
+            return jsonify({"error": str(e), **e.summary}), 500
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
             return jsonify({"error": str(e)}), 500
 
@@ -26,22 +54,8 @@ class ChamadoController:
         try:
             chamados = self.google_sheets_service.get_all_chamados()
 
-            # Corrigir o valor de TOTAL para exibir adequadamente
-            for chamado in chamados:
-                if "TOTAL" in chamado:
-                    try:
-                        total_value = float(chamado["TOTAL"]) / 100
-                        # Verifica se o número é inteiro ou decimal e formata apropriadamente
-                        chamado["TOTAL"] = int(total_value) if total_value.is_integer() else round(total_value, 2)
-                    except ValueError:
-                        chamado["TOTAL"] = None
-                if "totalHoras" in chamado:
-                    try:
-                        total_value = float(chamado["totalHoras"]) / 100
-                        # Verifica se o número é inteiro ou decimal e formata apropriadamente
-                        chamado["totalHoras"] = int(total_value) if total_value.is_integer() else round(total_value, 2)
-                    except ValueError:
-                        chamado["totalHoras"] = None
+            # Corrigir TOTAL e totalHoras (gravados x100) para exibir adequadamente
+            chamados = ChamadosTable(chamados).to_records()
             return jsonify(chamados), 200
         except Exception as e:
             return jsonify({"error": str(e)}), 500
\ No newline at end of file
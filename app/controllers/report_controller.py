@@ -1,57 +1,175 @@
-from flask import jsonify, send_file, request
-from app.services.google_sheets_service import GoogleSheetsService
-from app.services.pdf_service import PDFGenerator
-from app.services.pdf_service import MonthlyPDFReport
-from app.services.pipefy_service import PipefyService
-import pandas as pd
-import uuid
+from flask import Response, jsonify, send_file, request, url_for
+from app.services import registry
+from app.services.report_jobs import ReportDataNotFound
+from config import Config
 import re
+from datetime import date
 
 class ReportController:
-    def __init__(self):
-        self.google_sheets_service = GoogleSheetsService()
-        self.pipefy_service = PipefyService()
+    @property
+    def report_jobs(self):
+        return registry.get_report_jobs()
 
     def generate_report(self):
         try:
-            id_user_uuid = str(uuid.uuid4())
-            # Obter dados da planilha
-            records = self.google_sheets_service.get_all_chamados()
-
-            if not records:
-                return jsonify({"error": "Nenhum dado encontrado na planilha."}), 404
-
-            # Converter dados em DataFrame para facilitar o processamento
-            data = pd.DataFrame(records)
-
-            # Gerar o PDF
-            pdf_generator = PDFGenerator(data)
-            output_file = (f"{id_user_uuid}_output_file")
-            pdf_generator.generate_pdf(output_file)
-
-            # Retornar o arquivo gerado
-            return send_file(output_file, as_attachment=True)
+            params = self._chamados_filters(request.args)
+            return self._send_report("chamados", params, "relatorio_chamados.pdf")
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except ReportDataNotFound as e:
+            return jsonify({"error": str(e)}), 404
         except Exception as e:
             print(f"Erro ao gerar o relatório: {e}")
             return jsonify({"error": str(e)}), 500
 
     def generate_monthly_report(self):
         try:
+            if request.args.get("from") or request.args.get("to"):
+                params = self._month_range(request.args)
+                download_name = f"relatorios_mensais_{params['from']}_{params['to']}.zip"
+                return self._send_report("monthly_batch", params, download_name)
+
             month = request.args.get("month")
             if not month or not re.match(r"^\d{4}-\d{2}$", month):
                 return jsonify({"error": "Mês inválido ou não especificado"}), 400
 
-            data, graphs = self.pipefy_service.get_monthly_data(month)
-            if not data.get("total_cards"):
-                print(data)
-                return jsonify({"error": "Nenhum dado encontrado para o mês selecionado"}), 404
+            return self._send_report("monthly", {"month": month}, f"relatorio_mensal_{month}.pdf")
+
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
+        except ReportDataNotFound as e:
+            return jsonify({"error": str(e)}), 404
+        except Exception as e:
+            print(f"Erro ao gerar o relatório mensal: {e}")
+            return jsonify({"error": str(e)}), 500
+
+    @staticmethod
+    def _month_range(source):
+        """
+        Lê o período do lote de relatórios mensais (from e to no formato YYYY-MM, inclusivos).
+        :raises ValueError: Se o período for inválido ou maior que REPORT_BATCH_MAX_MONTHS.
+        """
+        month_from = source.get("from")
+        month_to = source.get("to") or month_from
+        for month in (month_from, month_to):
+            if not month or not re.match(r"^\d{4}-(0[1-9]|1[0-2])$", month):
+                raise ValueError("Período inválido: informe from e to no formato YYYY-MM")
+        if month_from > month_to:
+            raise ValueError("from deve ser anterior ou igual a to")
+
+        start_year, start_month = map(int, month_from.split("-"))
+        end_year, end_month = map(int, month_to.split("-"))
+        if (end_year - start_year) * 12 + end_month - start_month + 1 > Config.REPORT_BATCH_MAX_MONTHS:
+            raise ValueError(f"O período pode ter no máximo {Config.REPORT_BATCH_MAX_MONTHS} meses")
+        return {"from": month_from, "to": month_to}
+
+    @staticmethod
+    def _chamados_filters(source):
+        """
+        Lê os filtros do relatório de chamados: date_from e date_to (AAAA-MM-DD, inclusivos)
+        e solicitante (pode ser repetido). Só os filtros informados entram nos parâmetros,
+        que também compõem a chave do relatório no cache.
+        :raises ValueError: Se alguma data for inválida.
+        """
+        params = {}
+        for name in ("date_from", "date_to"):
+            value = source.get(name)
+            if value:
+                try:
+                    params[name] = date.fromisoformat(value).isoformat()
+                except (TypeError, ValueError):
+                    raise ValueError(f"Data inválida em {name}: {value} (use AAAA-MM-DD)")
+        if params.get("date_from") and params.get("date_to") and params["date_from"] > params["date_to"]:
+            raise ValueError("date_from deve ser anterior ou igual a date_to")
+
+        solicitantes = source.getlist("solicitante") if hasattr(source, "getlist") else source.get("solicitante")
+        if isinstance(solicitantes, str):
+            solicitantes = [solicitantes]
+        solicitantes = sorted({name.strip() for name in solicitantes or [] if name and name.strip()})
+        if solicitantes:
+            params["solicitante"] = solicitantes
+        return params
 
-            pdf_generator = MonthlyPDFReport(data, graphs, month)
-            output_file = f"relatorio_mensal_{month}.pdf"
-            pdf_generator.generate_pdf(output_file)
+    def _send_report(self, report_type, params, download_name):
+        """
+        Envia o PDF do relatório usando o cache de artefatos.
+        A chave do cache (derivada dos dados de origem) é usada como ETag: se o cliente já tem
+        essa versão (If-None-Match), responde 304 sem gerar nem ler o PDF.
+        """
+        prepared = self.report_jobs.prepare(report_type, params)
+        etag = prepared[0]
+        if request.if_none_match.contains(etag):
+            response = Response(status=304)
+            response.set_etag(etag)
+            return response
 
-            return send_file(output_file, as_attachment=True)
+        response = self._send_built(
+            lambda: self.report_jobs.build(report_type, params, prepared), download_name, etag=False
+        )
+        response.set_etag(etag)
+        return response
 
+    @staticmethod
+    def _send_built(build, download_name, path=None, **kwargs):
+        """
+        Envia o arquivo retornado por build() (ou path, se já conhecido).
+        O LRU do cache pode remover o arquivo entre a geração e o envio, quando outro relatório é
+        gravado nesse intervalo: nesse caso o relatório é gerado de novo, uma única vez.
+        """
+        try:
+            return send_file(path or build(), as_attachment=True, download_name=download_name, **kwargs)
+        except FileNotFoundError:
+            return send_file(build(), as_attachment=True, download_name=download_name, **kwargs)
+
+    def create_report_job(self):
+        try:
+            payload = request.get_json(silent=True) or request.args
+            report_type = payload.get("type", "monthly")
+            params = {}
+            if report_type == "monthly":
+                month = payload.get("month")
+                if not month or not re.match(r"^\d{4}-\d{2}$", month):
+                    return jsonify({"error": "Mês inválido ou não especificado"}), 400
+                params["month"] = month
+            elif report_type == "monthly_batch":
+                params = self._month_range(payload)
+            elif report_type == "chamados":
+                params = self._chamados_filters(payload)
+
+            job = self.report_jobs.submit(report_type, params)
+            return jsonify(job), 202
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
         except Exception as e:
-            print(f"Erro ao gerar o relatório mensal: {e}")
-            return jsonify({"error": str(e)}), 500
\ No newline at end of file
+            print(f"Erro ao enfileirar o relatório: {e}")
+            return jsonify({"error": str(e)}), 500
+
+    def get_report_job(self, job_id):
+        job = self.report_jobs.get(job_id)
+        if not job:
+            return jsonify({"error": "Job não encontrado"}), 404
+        if job["status"] == "done":
+            job["download_url"] = url_for("report.download_report_job", job_id=job_id)
+        return jsonify(job), 200
+
+    def download_report_job(self, job_id):
+        job = self.report_jobs.get(job_id)
+        if not job:
+            return jsonify({"error": "Job não encontrado"}), 404
+        path = self.report_jobs.get_path(job_id)
+        if not path:
+            return jsonify({"error": "Relatório ainda não está pronto", "status": job["status"]}), 409
+
+        if job["type"] == "monthly":
+            name = f"relatorio_mensal_{job['params']['month']}.pdf"
+        elif job["type"] == "monthly_batch":
+            name = f"relatorios_mensais_{job['params']['from']}_{job['params']['to']}.zip"
+        else:
+            name = "relatorio_chamados.pdf"
+        try:
+            return self._send_built(lambda: self.report_jobs.build(job["type"], job["params"]), name, path)
+        except ReportDataNotFound as e:
+            return jsonify({"error": str(e)}), 404
+        except Exception as e:
+            print(f"Erro ao enviar o relatório do job {job_id}: {e}")
+            return jsonify({"error": str(e)}), 500
@@ -0,0 +1,88 @@
+import sys
+from datetime import datetime
+
+COMPONENT_FIELD = "Componente -> Suporte a Sistemas"
+
+
+class Card:
+    """
+    Registro compacto de um card do Pipefy, normalizado uma única vez na ingestão:
+    campos indexados por nome, created_at já convertido e fase internada.
+    """
+
+    __slots__ = ("id", "title", "phase", "created_at", "created_at_raw", "updated_at", "fields", "phase_history")
+
+    def __init__(self, id, title, phase, created_at_raw, updated_at, fields, phase_history=None):
+        self.id = str(id)
+        self.title = title
+        self.phase = sys.intern(phase) if phase else None
+        self.created_at_raw = created_at_raw
+        self.created_at = self.parse_date(created_at_raw) if created_at_raw else None
+        self.updated_at = updated_at
+        self.fields = fields
+        # Lista de (fase, firstTimeIn, lastTimeOut, duração em segundos); None quando não foi consultado
+        self.phase_history = phase_history
+
+    @classmethod
+    def from_node(cls, node):
+        """
+        Cria o registro a partir de um node retornado pela API do Pipefy.
+        Um created_at em formato inesperado é descartado (o card fica sem data e sem mês), para que
+        um único card não interrompa a sincronização.
+        """
+        attributes = {
+            "id": node["id"],
+            "title": node.get("title"),
+            "phase": (node.get("current_phase") or {}).get("name"),
+            "created_at_raw": node.get("created_at"),
+            "updated_at": node.get("updated_at"),
+            "fields": {field["name"]: field["value"] for field in node.get("fields") or []},
+            "phase_history": cls.parse_phase_history(node["phases_history"]) if "phases_history" in node else None,
+        }
+        try:
+            return cls(**attributes)
+        except ValueError as e:
+            print(f"Data de criação inválida no card {attributes['id']}, armazenado sem created_at: {e}")
+            attributes["created_at_raw"] = None
+            return cls(**attributes)
+
+    @staticmethod
+    def parse_phase_history(phases_history):
+        """Converte o phases_history da API em tuplas compactas (fase, entrada, saída, duração)."""
+        return [
+            (
+                sys.intern((item.get("phase") or {}).get("name") or ""),
+                item.get("firstTimeIn"),
+                item.get("lastTimeOut"),
+                item.get("duration"),
+            )
+            for item in phases_history or []
+        ]
+
+    @property
+    def component(self):
+        """Valor do campo "Componente -> Suporte a Sistemas"."""
+        return self.fields.get(COMPONENT_FIELD)
+
+    @property
+    def created_month(self):
+        """Mês de criação ("YYYY-MM") no fuso em que o Pipefy retornou a data."""
+        return self.created_at_raw[:7] if self.created_at_raw else None
+
+    def to_node(self):
+        """Converte de volta para o formato de node da API (usado nas respostas JSON)."""
+        return {
+            "id": self.id,
+            "title": self.title,
+            "fields": [{"name": name, "value": value} for name, value in self.fields.items()],
+            "current_phase": {"name": self.phase},
+            "created_at": self.created_at_raw,
+            "updated_at": self.updated_at,
+        }
+
+    def to_edge(self):
+        return {"node": self.to_node()}
+
+    @staticmethod
+    def parse_date(value):
+        return datetime.strptime(value, "%Y-%m-%dT%H:%M:%S%z")
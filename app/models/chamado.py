@@ -1,4 +1,43 @@
-from datetime import datetime
+import re
+import numpy as np
+
+# HH:MM (hora com 1 ou 2 dígitos); o formato exato "HH:MM" é tratado sem regex
+TIME_PATTERN = re.compile(r"(\d{1,2}):(\d{2})")
+
+# Campos do JSON/CSV de entrada, na ordem das colunas da planilha
+REQUIRED_FIELDS = (
+    "descricaoAnalista",
+    "data",
+    "solicitante",
+    "descricaoSolicitacao",
+    "horaInicial",
+    "horaFinal",
+)
+
+
+def parse_minutes(value):
+    """
+    Converte um horário "HH:MM" em minutos desde a meia-noite.
+    :param value: Horário (string).
+    :return: Minutos (int), ou -1 se o horário for inválido.
+    """
+    if type(value) is str and len(value) == 5 and value[2] == ":" and value[:2].isdigit() and value[3:].isdigit():
+        hours, minutes = int(value[:2]), int(value[3:])
+    else:
+        match = TIME_PATTERN.fullmatch(str(value).strip())
+        if match is None:
+            return -1
+        hours, minutes = int(match[1]), int(match[2])
+    return hours * 60 + minutes if hours < 24 and minutes < 60 else -1
+
+
+def parse_minutes_bulk(values):
+    """
+    Converte uma sequência de horários "HH:MM" em minutos desde a meia-noite.
+    :return: Array int64 com os minutos (-1 para valores inválidos).
+    """
+    return np.fromiter((parse_minutes(value) for value in values), dtype=np.int64, count=len(values))
+
 
 class Chamado:
     def __init__(self, descricao_analista, data, solicitante, descricao_solicitacao, hora_inicial, hora_final):
@@ -9,9 +48,31 @@ class Chamado:
         self.hora_inicial = hora_inicial
         self.hora_final = hora_final
 
-    def to_dict(self):
-        """Converte os dados do chamado em um dicionário."""
-        total_horas = self.calcular_total_horas()
+    @classmethod
+    def from_dict(cls, data):
+        """
+        Cria um chamado a partir do JSON da API (ou de uma linha do CSV de importação).
+        :raises ValueError: Se faltar algum campo obrigatório.
+        """
+        missing = [field for field in REQUIRED_FIELDS if data.get(field) is None]
+        if missing:
+            raise ValueError(f"Campos obrigatórios ausentes: {', '.join(missing)}")
+        return cls(
+            descricao_analista=data['descricaoAnalista'],
+            data=data['data'],
+            solicitante=data['solicitante'],
+            descricao_solicitacao=data['descricaoSolicitacao'],
+            hora_inicial=data['horaInicial'],
+            hora_final=data['horaFinal']
+        )
+
+    def to_dict(self, total_horas=None):
+        """
+        Converte os dados do chamado em um dicionário.
+        :param total_horas: Total de horas já calculado (ex.: por compute_hours_bulk); calculado aqui se omitido.
+        """
+        if total_horas is None:
+            total_horas = self.calcular_total_horas()
         return {
             "DescricaoAnalista": self.descricao_analista,
             "Data": self.data,
@@ -23,12 +84,32 @@ class Chamado:
         }
 
     def calcular_total_horas(self):
-        """Calcula o total de horas com base nos horários."""
-        try:
-            hora_inicial = datetime.strptime(self.hora_inicial, '%H:%M')
-            hora_final = datetime.strptime(self.hora_final, '%H:%M')
-            diferenca = hora_final - hora_inicial
-            total_horas = diferenca.total_seconds() / 3600
-            return round(total_horas, 2) if total_horas > 0 else 0
-        except Exception as e:
-            return str(e)
\ No newline at end of file
+        """
+        Calcula o total de horas com base nos horários.
+        :raises ValueError: Se horaInicial ou horaFinal não estiverem no formato HH:MM.
+        """
+        hours, valid = Chamado.compute_hours_bulk([self.hora_inicial], [self.hora_final])
+        if not valid[0]:
+            raise ValueError(
+                f"Horário inválido (esperado HH:MM): horaInicial={self.hora_inicial!r}, horaFinal={self.hora_final!r}"
+            )
+        total_horas = float(hours[0])
+        return total_horas if total_horas > 0 else 0
+
+    @staticmethod
+    def compute_hours_bulk(hora_inicial, hora_final):
+        """
+        Calcula o total de horas de vários chamados de uma vez.
+        :param hora_inicial: Sequência de horários iniciais ("HH:MM").
+        :param hora_final: Sequência de horários finais ("HH:MM"), na mesma ordem.
+        :return: Tupla (horas, válidos): array float64 com as horas (arredondadas em 2 casas,
+            0 quando a hora final não é posterior à inicial) e máscara booleana dos pares válidos.
+        """
+        if len(hora_inicial) != len(hora_final):
+            raise ValueError("hora_inicial e hora_final devem ter o mesmo tamanho")
+        inicio = parse_minutes_bulk(hora_inicial)
+        fim = parse_minutes_bulk(hora_final)
+        valid = (inicio >= 0) & (fim >= 0)
+        hours = np.round(np.maximum(fim - inicio, 0) / 60, 2)
+        hours[~valid] = np.nan
+        return hours, valid
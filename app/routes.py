@@ -1,9 +1,16 @@
-from flask import Blueprint, jsonify, request
-import requests
-from datetime import datetime
+from flask import Blueprint, Response, jsonify, request, stream_with_context
 from app.controllers.chamado_controller import ChamadoController
 from app.controllers.report_controller import ReportController
+from app.services.aggregation_service import CardAggregation, DIMENSIONS
+from app.services import registry
+from app.services.card_query import CardQuery
+from app.services.dashboard_feed import DASHBOARD_QUERY, format_event
+from app.services.pipefy_webhooks import PipefyWebhookHandler, verify_signature
 from config import Config
+import json
+import queue
+import re
+from datetime import date
 
 report_bp = Blueprint('report', __name__)
 report_controller = ReportController()
@@ -13,6 +20,12 @@ chamado_controller = ChamadoController()
 
 chamados_bp.add_url_rule('/chamados', 'get_all_chamados', chamado_controller.get_all_chamados, methods=['GET'])
 chamados_bp.add_url_rule('/chamados', 'add_chamado', chamado_controller.add_chamado, methods=['POST'])
+chamados_bp.add_url_rule(
+    '/chamados/import',
+    'import_chamados',
+    chamado_controller.import_chamados,
+    methods=['POST'],
+)
 
 report_bp.add_url_rule('/generate', 'generate', report_controller.generate_report, methods=['GET'])
 
@@ -23,187 +36,234 @@ report_bp.add_url_rule(
     methods=["GET"],
 )
 
+report_bp.add_url_rule('/jobs', 'create_report_job', report_controller.create_report_job, methods=['POST'])
+report_bp.add_url_rule('/jobs/<job_id>', 'get_report_job', report_controller.get_report_job, methods=['GET'])
+report_bp.add_url_rule(
+    '/jobs/<job_id>/download',
+    'download_report_job',
+    report_controller.download_report_job,
+    methods=['GET'],
+)
+
 pipefy_bp = Blueprint('pipefy', __name__)
 
+# Quantidade de cards serializados por bloco nas respostas em streaming
+STREAM_CHUNK_SIZE = 200
+
 @pipefy_bp.route('/cards', methods=['GET'])
 def get_pipefy_cards():
     try:
         print("Buscando dados do Pipefy para o dashboard...")
-        PIPEFY_API_URL = "https://api.pipefy.com/graphql"
-        HEADERS = {
-            "Authorization": f"Bearer {Config.PIPEFY_KEY}"
-        }
-
-        query_template = """
-        query ($pipeId: ID!, $after: String) {
-          cards(pipe_id: $pipeId, first: 300, after: $after) {
-            edges {
-              node {
-                id
-                title
-                fields {
-                  name
-                  value
-                }
-                current_phase {
-                  name
-                }
-              }
-            }
-            pageInfo {
-              hasNextPage
-              endCursor
-            }
-          }
-        }
-        """
-
-        pipe_id = 303822738
-        all_cards = []
-        has_next_page = True
-        after_cursor = None
-
-        while has_next_page == True:
-            variables = {"pipeId": pipe_id, "after": after_cursor}
-            response = requests.post(
-                PIPEFY_API_URL,
-                json={"query": query_template, "variables": variables},
-                headers=HEADERS,
-            )
-            response.raise_for_status()
-
-            data = response.json()
-            cards_data = data["data"]["cards"]
-            all_cards.extend(cards_data["edges"])
-            page_info = cards_data["pageInfo"]
-            has_next_page = page_info["hasNextPage"]
-            after_cursor = page_info["endCursor"]
-
+        service = registry.get_pipefy_service()
         # Filtrar cards com "Componente" == "Suporte a Sistemas"
-        suporte_cards = [
-            card for card in all_cards
-            if any(
-                field["name"] == "Componente -> Suporte a Sistemas"
-                and field["value"] in ["Meu RH", "TOTVS Datasul"]
-                for field in card["node"]["fields"]
-            )
-               and card["node"]["current_phase"]["name"] != "Concluído"
-        ]
-
-        # Contar valores específicos no campo de seleção
-        counts = {"Meu RH": 0, "TOTVS Datasul": 0}
-        for card in suporte_cards:
-            for field in card["node"]["fields"]:
-                if field["name"] == "Componente -> Suporte a Sistemas" and field["value"] in counts:
-                    counts[field["value"]] += 1
-        # Organizar contagens por fase
-        phases_count = {
-            "triagem": sum(
-                1 for card in suporte_cards if card["node"]["current_phase"]["name"] == "Triagem"
-            ),
-            "pendente": sum(
-                1 for card in suporte_cards if card["node"]["current_phase"]["name"] == "Pendente"
-            ),
-            "em_atendimento": sum(
-                1 for card in suporte_cards if card["node"]["current_phase"]["name"] == "Em atendimento"
-            ),
-            "escalar_chamado": sum(
-                1 for card in suporte_cards if card["node"]["current_phase"]["name"] == "Escalar o Chamado"
-            ),
-        }
-        return jsonify({
-            "counts": counts,
-            "phases_count": phases_count,
-            "cards": suporte_cards,
-        })
+        query = DASHBOARD_QUERY
+
+        # Somente as contagens: servidas direto do rollup, sem carregar os cards
+        if request.args.get('include_cards', 'true').lower() in ('0', 'false', 'no'):
+            metrics = CardAggregation.from_rollup(service.get_rollup(Config.PIPEFY_PIPE_ID, query)).dashboard_metrics()
+            return jsonify(metrics)
+
+        suporte_cards = service.get_cards(Config.PIPEFY_PIPE_ID, query)
+
+        metrics = CardAggregation(suporte_cards).dashboard_metrics()
+
+        # A lista de cards é serializada aos poucos (resposta chunked) em vez de montada inteira pelo jsonify
+        def generate():
+            yield '{"counts": ' + json.dumps(metrics["counts"])
+            yield ', "phases_count": ' + json.dumps(metrics["phases_count"])
+            yield ', "cards": ['
+            for start in range(0, len(suporte_cards), STREAM_CHUNK_SIZE):
+                chunk = suporte_cards[start:start + STREAM_CHUNK_SIZE]
+                yield ("," if start else "") + ",".join(json.dumps(card.to_edge()) for card in chunk)
+            yield "]}"
+
+        return Response(stream_with_context(generate()), mimetype="application/json")
 
     except Exception as e:
         print(f"Erro ao buscar dados do Pipefy: {e}")
         return jsonify({"error": str(e)}), 500
 
+@pipefy_bp.route('/stream', methods=['GET'])
+def stream_pipefy_dashboard():
+    """
+    Feed ao vivo do dashboard (Server-Sent Events): um evento "snapshot" com o mesmo conteúdo de
+    /pipefy/cards ao conectar e, depois, eventos "diff" só com as contagens e cards alterados.
+    """
+    feed = registry.get_dashboard_feed()
+    subscription = feed.subscribe()
+
+    def generate():
+        try:
+            try:
+                version, message = feed.snapshot()
+            except Exception as e:
+                print(f"Erro ao montar o snapshot do dashboard: {e}")
+                yield format_event("error", {"error": str(e)})
+                return
+            yield message
+            while True:
+                try:
+                    item = subscription.get(timeout=Config.PIPEFY_STREAM_HEARTBEAT)
+                except queue.Empty:
+                    yield ": ping\n\n"
+                    continue
+                if item is None:
+                    return
+                item_version, message = item
+                # Diferenças já incluídas no snapshot
+                if item_version > version:
+                    yield message
+        finally:
+            feed.unsubscribe(subscription)
+
+    return Response(
+        generate(),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+# Mês no formato "YYYY-MM", com o mês entre 01 e 12
+MONTH_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
+
+def _parse_month(month, year=None):
+    """
+    Normaliza o mês para "YYYY-MM". Aceita "YYYY-MM" ou só o número do mês junto com o ano
+    (parâmetro year; se omitido, o ano atual), para não misturar meses de anos diferentes.
+    """
+    if re.match(MONTH_PATTERN, month):
+        return month
+    if not re.match(r"^(0?[1-9]|1[0-2])$", month) or (year and not re.match(r"^\d{4}$", year)):
+        raise ValueError("Mês inválido: use YYYY-MM, ou month=M com year=YYYY")
+    return f"{year or date.today().year}-{int(month):02d}"
+
+def _month_range_args():
+    """
+    Lê o período ?from=YYYY-MM&to=YYYY-MM (inclusivo). Sem to, só o mês de from; sem from, até o mês de to.
+    :return: Tupla (from, to); ambos None sem período.
+    :raises ValueError: Se algum mês for inválido.
+    """
+    month_from = request.args.get('from')
+    month_to = request.args.get('to') or month_from
+    for value in (month_from, month_to):
+        if value and not re.match(MONTH_PATTERN, value):
+            raise ValueError("Mês inválido")
+    return month_from, month_to
+
 @pipefy_bp.route('/cards_by_month', methods=['GET'])
 def get_pipefy_cards_by_month():
     try:
         month = request.args.get('month')
         if not month:
             return jsonify({"error": "Mês não fornecido"}), 400
+        month = _parse_month(month, request.args.get('year'))
 
-        PIPEFY_API_URL = "https://api.pipefy.com/graphql"
-        HEADERS = {
-            "Authorization": f"Bearer {Config.PIPEFY_KEY}"
-        }
-
-        query_template = """
-        query ($pipeId: ID!, $after: String) {
-          cards(pipe_id: $pipeId, first: 300, after: $after) {
-            edges {
-              node {
-                id
-                title
-                fields {
-                  name
-                  value
-                }
-                current_phase {
-                  name
-                }
-                created_at
-              }
-            }
-            pageInfo {
-              hasNextPage
-              endCursor
-            }
-          }
-        }
-        """
-
-        pipe_id = 303822738
-        all_cards = []
-        has_next_page = True
-        after_cursor = None
-
-        while has_next_page:
-            variables = {"pipeId": pipe_id, "after": after_cursor}
-            response = requests.post(
-                PIPEFY_API_URL,
-                json={"query": query_template, "variables": variables},
-                headers=HEADERS,
-            )
-            response.raise_for_status()
-
-            data = response.json()
-            cards_data = data["data"]["cards"]
-            all_cards.extend(cards_data["edges"])
-            page_info = cards_data["pageInfo"]
-            has_next_page = page_info["hasNextPage"]
-            after_cursor = page_info["endCursor"]
-
-        # Filtrar cards pelo mês selecionado
-        selected_month_cards = [
-            card for card in all_cards
-            if datetime.strptime(card["node"]["created_at"], "%Y-%m-%dT%H:%M:%S%z").month == int(month)
-            and any(
-                field["name"] == "Componente -> Suporte a Sistemas"
-                and field["value"] in ["Meu RH", "TOTVS Datasul"]
-                for field in card["node"]["fields"]
-            )
-        ]
-
-        totals = {"Meu RH": 0, "TOTVS Datasul": 0}
-        completed = {"Meu RH": 0, "TOTVS Datasul": 0}
-        for card in selected_month_cards:
-            for field in card["node"]["fields"]:
-                if field["name"] == "Componente -> Suporte a Sistemas" and field["value"] in totals:
-                    totals[field["value"]] += 1
-                    if card["node"]["current_phase"]["name"] == "Concluído":
-                        completed[field["value"]] += 1
-
-        return jsonify({
-            "totals": totals,
-            "completed": completed,
-        })
+        rollup = registry.get_pipefy_service().get_rollup(
+            Config.PIPEFY_PIPE_ID,
+            CardQuery.for_month(month, components=["Meu RH", "TOTVS Datasul"]),
+        )
+        return jsonify(CardAggregation.from_rollup(rollup).month_metrics())
 
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
     except Exception as e:
         print(f"Erro ao buscar dados do Pipefy por mês: {e}")
-        return jsonify({"error": str(e)}), 500
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
+
+@pipefy_bp.route('/trend', methods=['GET'])
+def get_pipefy_trend():
+    try:
+        month_from, month_to = _month_range_args()
+        dims = request.args.get('group_by', ",".join(DIMENSIONS)).split(",")
+
+        rollup = registry.get_pipefy_service().get_rollup(
+            Config.PIPEFY_PIPE_ID,
+            CardQuery(month_from=month_from, month_to=month_to, components=["Meu RH", "TOTVS Datasul"]),
+        )
+        return jsonify(CardAggregation.from_rollup(rollup).trend(dims))
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Erro ao buscar tendência do Pipefy: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@pipefy_bp.route('/timeseries', methods=['GET'])
+def get_pipefy_timeseries():
+    """
+    Série temporal mensal contínua para gráficos: ?from=YYYY-MM&to=YYYY-MM&by=component|phase.
+    Sem from/to, vai do primeiro ao último mês com cards.
+    """
+    try:
+        month_from = request.args.get('from')
+        month_to = request.args.get('to')
+        by = request.args.get('by') or None
+        for value in (month_from, month_to):
+            if value and not re.match(MONTH_PATTERN, value):
+                return jsonify({"error": "Mês inválido"}), 400
+
+        # O rollup tem uma linha por (mês, componente, fase): basta lê-lo inteiro e recortar o período na série
+        rollup = registry.get_pipefy_service().get_rollup(
+            Config.PIPEFY_PIPE_ID, CardQuery(components=["Meu RH", "TOTVS Datasul"])
+        )
+        months = [row[0] for row in rollup if row[0]]
+        if not months and not (month_from and month_to):
+            return jsonify({"months": [], "series": {}})
+
+        aggregation = CardAggregation.from_rollup(rollup)
+        return jsonify(aggregation.time_series(by, month_from or min(months), month_to or max(months)))
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Erro ao buscar série temporal do Pipefy: {e}")
+        return jsonify({"error": str(e)}), 500
+
+@pipefy_bp.route('/cycle_time', methods=['GET'])
+def get_pipefy_cycle_time():
+    """
+    Percentis (p50/p90, em horas) do tempo em cada fase e do tempo de ciclo:
+    ?from=YYYY-MM&to=YYYY-MM&group_by=component,month.
+    """
+    try:
+        month_from, month_to = _month_range_args()
+        group_by = request.args.get('group_by', 'component,month')
+        dims = [dim for dim in group_by.split(",") if dim]
+        if set(dims) - {"component", "month"}:
+            return jsonify({"error": "group_by aceita somente component e month"}), 400
+
+        return jsonify(registry.get_pipefy_service().get_cycle_times(
+            Config.PIPEFY_PIPE_ID,
+            CardQuery(month_from=month_from, month_to=month_to, components=["Meu RH", "TOTVS Datasul"]),
+            by=dims,
+        ))
+
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        print(f"Erro ao calcular o tempo de ciclo: {e}")
+        return jsonify({"error": str(e)}), 500
+
+webhooks_bp = Blueprint('webhooks', __name__)
+pipefy_webhook_handler = PipefyWebhookHandler()
+
+@webhooks_bp.route('/pipefy', methods=['POST'])
+def receive_pipefy_webhook():
+    """Recebe os eventos card.create, card.move e card.field_update do Pipefy (assinados com HMAC)."""
+    if not Config.PIPEFY_WEBHOOK_SECRET:
+        return jsonify({"error": "Webhook do Pipefy não configurado"}), 404
+    body = request.get_data()
+    if not verify_signature(body, request.headers.get('X-Pipefy-Signature')):
+        return jsonify({"error": "Assinatura inválida"}), 401
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return jsonify({"error": "JSON inválido"}), 400
+
+    try:
+        return jsonify(pipefy_webhook_handler.handle(payload))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except Exception as e:
+        # Erro temporário (ex.: API indisponível ao buscar o card): o Pipefy reenviará o evento
+        print(f"Erro ao aplicar evento do webhook do Pipefy: {e}")
+        return jsonify({"error": str(e)}), 503
@@ -0,0 +1,207 @@
+import numpy as np
+import pandas as pd
+
+COMPONENTS = ["Meu RH", "TOTVS Datasul"]
+PHASES = ["Triagem", "Pendente", "Em atendimento", "Escalar o Chamado", "Concluído"]
+DIMENSIONS = ("month", "component", "phase")
+
+# Fases em que o chamado está aberto: o tempo nelas compõe o tempo de ciclo (SLA)
+SLA_PHASES = ["Triagem", "Pendente", "Em atendimento", "Escalar o Chamado"]
+DEFAULT_PERCENTILES = (0.5, 0.9)
+
+# Fases exibidas no dashboard e a chave usada na resposta
+DASHBOARD_PHASES = {
+    "triagem": "Triagem",
+    "pendente": "Pendente",
+    "em_atendimento": "Em atendimento",
+    "escalar_chamado": "Escalar o Chamado",
+}
+
+
+class CardAggregation:
+    """
+    Carrega os cards em um DataFrame colunar (mês, componente e fase como categóricos)
+    e calcula as métricas dos endpoints a partir de um único group-by.
+    Também pode partir das contagens já agregadas do rollup (from_rollup), sem carregar os cards.
+    """
+
+    def __init__(self, cards):
+        """
+        :param cards: Lista de Card.
+        """
+        self.cards = cards
+        self.frame = self.build_frame(cards)
+
+    @classmethod
+    def from_rollup(cls, rows):
+        """
+        Agregação a partir das contagens do rollup do CardStore.
+        :param rows: Lista de (mês, componente, fase, quantidade).
+        """
+        aggregation = cls.__new__(cls)
+        aggregation.cards = []
+        aggregation.frame = cls._frame(
+            [row[0] for row in rows], [row[1] for row in rows], [row[2] for row in rows], [row[3] for row in rows]
+        )
+        return aggregation
+
+    @classmethod
+    def build_frame(cls, cards):
+        return cls._frame(
+            [card.created_month for card in cards],
+            [card.component for card in cards],
+            [card.phase for card in cards],
+            [1] * len(cards),
+        )
+
+    @staticmethod
+    def _frame(months, components, phases, counts):
+        known_phases = PHASES + sorted({phase for phase in phases if phase and phase not in PHASES})
+        frame = pd.DataFrame({"month": months, "component": components, "phase": phases, "count": counts})
+        frame["month"] = frame["month"].astype("category")
+        frame["component"] = pd.Categorical(frame["component"], categories=COMPONENTS)
+        frame["phase"] = pd.Categorical(frame["phase"], categories=known_phases)
+        frame["count"] = frame["count"].astype("int64")
+        return frame
+
+    def group_counts(self, dims=DIMENSIONS):
+        """
+        Quantidade de cards por combinação das dimensões informadas.
+        :param dims: Dimensões do agrupamento (qualquer combinação de "month", "component", "phase").
+        :return: Series indexada pelas dimensões, somente com combinações existentes.
+        """
+        dims = list(dims)
+        unknown = set(dims) - set(DIMENSIONS)
+        if unknown:
+            raise ValueError(f"Dimensões inválidas: {', '.join(sorted(unknown))}")
+        return self.frame.groupby(dims, observed=True)["count"].sum()
+
+    def _component_phase_table(self):
+        """Tabela componente x fase com todas as combinações (zeros incluídos)."""
+        return self.frame.groupby(["component", "phase"], observed=False)["count"].sum().unstack(fill_value=0)
+
+    def dashboard_metrics(self):
+        """Contagens por componente e por fase exibidas em /pipefy/cards."""
+        table = self._component_phase_table()
+        return {
+            "counts": {component: int(table.loc[component].sum()) for component in COMPONENTS},
+            "phases_count": {key: int(table[phase].sum()) for key, phase in DASHBOARD_PHASES.items()},
+        }
+
+    def month_metrics(self):
+        """Totais e concluídos por componente exibidos em /pipefy/cards_by_month."""
+        table = self._component_phase_table()
+        return {
+            "totals": {component: int(table.loc[component].sum()) for component in COMPONENTS},
+            "completed": {component: int(table.loc[component, "Concluído"]) for component in COMPONENTS},
+        }
+
+    def monthly_report_metrics(self):
+        """Contagens usadas no relatório mensal (por componente, por fase e títulos concluídos)."""
+        table = self._component_phase_table()
+        phase_totals = table.sum(axis=0)
+        return {
+            "counts": {component: int(table.loc[component].sum()) for component in COMPONENTS},
+            "phases_count": {phase: int(total) for phase, total in phase_totals.items() if total},
+            "concluded_titles": [card.title for card in self.cards if card.phase == "Concluído"],
+        }
+
+    def trend(self, dims=DIMENSIONS):
+        """
+        Série de contagens para gráficos de tendência.
+        :return: Lista de dicionários {dimensão: valor, ..., "count": n}.
+        """
+        counts = self.group_counts(dims)
+        return [
+            {**dict(zip(counts.index.names, key if isinstance(key, tuple) else (key,))), "count": int(count)}
+            for key, count in counts.items()
+        ]
+
+    def time_series(self, by, month_from, month_to):
+        """
+        Série temporal contínua (meses sem cards aparecem com zero) para gráficos de tendência.
+        :param by: Dimensão de cada série ("component" ou "phase"), ou None para o total.
+        :param month_from: Primeiro mês ("YYYY-MM").
+        :param month_to: Último mês ("YYYY-MM").
+        :return: {"months": [...], "series": {nome: [quantidade por mês]}}.
+        """
+        if by not in (None, "component", "phase"):
+            raise ValueError(f"Dimensão inválida: {by}")
+        months = list(pd.period_range(month_from, month_to, freq="M").strftime("%Y-%m"))
+
+        if by is None:
+            table = self.group_counts(["month"]).to_frame("total")
+        else:
+            table = self.group_counts(["month", by]).unstack(fill_value=0)
+        table = table.reindex(months, fill_value=0)
+        return {
+            "months": months,
+            "series": {str(name): [int(value) for value in table[name]] for name in table.columns},
+        }
+
+
+class PhaseDurationAnalysis:
+    """
+    Tempos de permanência por fase e tempo de ciclo dos cards (a partir do phases_history),
+    calculados de forma vetorizada com pandas.
+    """
+
+    def __init__(self, rows):
+        """
+        :param rows: Lista de (id do card, mês, componente, fase atual, fase, entrada, saída, duração em segundos),
+            como retornada por CardStore.phase_durations().
+        """
+        frame = pd.DataFrame(
+            rows,
+            columns=["card_id", "month", "component", "current_phase", "phase", "time_in", "time_out", "duration"],
+        )
+        # Duração informada pelo Pipefy; sem ela, a diferença entre a saída e a primeira entrada
+        elapsed = (
+            pd.to_datetime(frame["time_out"], utc=True, errors="coerce")
+            - pd.to_datetime(frame["time_in"], utc=True, errors="coerce")
+        ).dt.total_seconds()
+        seconds = pd.to_numeric(frame["duration"], errors="coerce").fillna(elapsed)
+        frame["hours"] = seconds.to_numpy(dtype=np.float64) / 3600
+        self.frame = frame.dropna(subset=["hours"])
+
+    def phase_percentiles(self, by=("component", "month"), percentiles=DEFAULT_PERCENTILES):
+        """
+        Percentis do tempo (horas) em cada fase de SLA_PHASES.
+        :param by: Dimensões do agrupamento (além da fase): "component" e/ou "month".
+        :return: Lista de dicionários {dimensões..., "phase", "count", "p50", "p90", ...}.
+        """
+        frame = self.frame[self.frame["phase"].isin(SLA_PHASES)]
+        return self._percentiles(frame, [*by, "phase"], percentiles)
+
+    def cycle_time_percentiles(self, by=("component", "month"), percentiles=DEFAULT_PERCENTILES):
+        """
+        Percentis do tempo de ciclo (soma das horas nas fases de SLA_PHASES) dos cards concluídos.
+        :param by: Dimensões do agrupamento: "component" e/ou "month".
+        :return: Lista de dicionários {dimensões..., "count", "p50", "p90", ...}.
+        """
+        frame = self.frame[(self.frame["current_phase"] == "Concluído") & self.frame["phase"].isin(SLA_PHASES)]
+        per_card = frame.groupby(["card_id", "month", "component"], dropna=False, sort=False)["hours"].sum()
+        return self._percentiles(per_card.reset_index(), list(by), percentiles)
+
+    def phase_medians(self):
+        """Mediana das horas em cada fase de SLA_PHASES (fases sem dados ficam com 0), para o gráfico de SLA."""
+        medians = self.frame.groupby("phase")["hours"].median()
+        return {phase: round(float(medians.get(phase, 0.0)), 1) for phase in SLA_PHASES}
+
+    @staticmethod
+    def _percentiles(frame, dims, percentiles):
+        if frame.empty:
+            return []
+        grouped = frame.groupby(dims, dropna=False)["hours"] if dims else frame.assign(_all=0).groupby("_all")["hours"]
+        table = grouped.quantile(list(percentiles)).unstack()
+        table.columns = [f"p{round(q * 100)}" for q in table.columns]
+        table["count"] = grouped.size()
+        table = table.reset_index().drop(columns=["_all"], errors="ignore")
+        records = table.to_dict("records")
+        for record in records:
+            for key, value in record.items():
+                if isinstance(value, float):
+                    record[key] = None if np.isnan(value) else round(value, 2)
+                elif isinstance(value, np.integer):
+                    record[key] = int(value)
+        return records
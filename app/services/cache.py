@@ -0,0 +1,101 @@
+import threading
+import time
+from concurrent.futures import Future
+
+
+class TTLCache:
+    """
+    Cache em memória com expiração (TTL), stale-while-revalidate e coalescência de requisições:
+    - dentro do TTL o valor é devolvido direto;
+    - vencido, mas dentro da janela "stale", o valor antigo é devolvido e a atualização roda em segundo plano;
+    - chamadas simultâneas para a mesma chave compartilham uma única execução do loader.
+    """
+
+    def __init__(self, ttl, stale_ttl=0):
+        """
+        :param ttl: Segundos em que o valor é considerado atual.
+        :param stale_ttl: Segundos adicionais em que o valor antigo ainda pode ser servido.
+        """
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self._entries = {}
+        self._inflight = {}
+        # Incrementada por invalidate(): uma carga iniciada antes da invalidação não grava o resultado
+        # (e deixa de ser compartilhada com chamadas posteriores, que iniciam uma carga nova)
+        self._generations = {}
+        self._generation = 0
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, loader):
+        """
+        Retorna o valor da chave, executando loader() quando necessário.
+        :param key: Chave (hashable) do valor.
+        :param loader: Função sem argumentos que produz o valor.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                value, stored_at = entry
+                age = time.monotonic() - stored_at
+                if age < self.ttl:
+                    return value
+                if age < self.ttl + self.stale_ttl:
+                    if key not in self._inflight:
+                        future = self._inflight[key] = Future()
+                        threading.Thread(
+                            target=self._load,
+                            args=(key, loader, future, self._current_generation(key)),
+                            daemon=True,
+                        ).start()
+                    return value
+
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = self._inflight[key] = Future()
+                generation = self._current_generation(key)
+
+        if owner:
+            self._load(key, loader, future, generation)
+        return future.result()
+
+    def _load(self, key, loader, future, generation):
+        """
+        Executa loader() e resolve a future de quem aguarda essa carga.
+        :param generation: Geração da chave quando a carga começou; se mudou, o valor não é guardado.
+        """
+        try:
+            value = loader()
+        except Exception as e:
+            with self._lock:
+                self._release(key, future)
+            future.set_exception(e)
+            return
+        with self._lock:
+            if self._current_generation(key) == generation:
+                self._entries[key] = (value, time.monotonic())
+            self._release(key, future)
+        future.set_result(value)
+
+    def _release(self, key, future):
+        # A carga pode ter sido desvinculada por invalidate() e substituída por uma nova
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+
+    def _current_generation(self, key):
+        return (self._generation, self._generations.get(key, 0))
+
+    def invalidate(self, key=None):
+        """
+        Remove uma chave (ou todas, se key for None).
+        Quem já aguarda uma carga em andamento recebe o resultado dela; chamadas posteriores carregam de novo.
+        """
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+                self._inflight.clear()
+                self._generation += 1
+            else:
+                self._entries.pop(key, None)
+                self._inflight.pop(key, None)
+                self._generations[key] = self._generations.get(key, 0) + 1
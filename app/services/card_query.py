@@ -0,0 +1,95 @@
+class CardQuery:
+    """
+    Descreve os critérios de busca de cards e os traduz para:
+    - filtro AdvancedSearch do Pipefy (allCards), usado só pelas fatias da sincronização
+      (created_from/created_before e updated_since);
+    - cláusula SQL do CardStore, de onde os endpoints e relatórios leem: os filtros de mês,
+      componente e fase são aplicados somente ali, nunca enviados à API.
+    """
+
+    def __init__(self, month_from=None, month_to=None, updated_since=None,
+                 components=None, phases=None, exclude_phases=None,
+                 created_from=None, created_before=None):
+        """
+        :param month_from: Primeiro mês de criação (inclusive) no formato "YYYY-MM"; sem ele, desde o início.
+        :param month_to: Último mês de criação (inclusive) no formato "YYYY-MM"; sem ele, só month_from.
+        :param updated_since: Data ISO; somente cards atualizados a partir dela.
+        :param components: Valores aceitos para o campo "Componente -> Suporte a Sistemas".
+        :param phases: Fases aceitas.
+        :param exclude_phases: Fases ignoradas.
+        :param created_from: Data ISO; created_at >= (filtro exato, somente na API; usado para fatiar o crawl).
+        :param created_before: Data ISO; created_at < (filtro exato, somente na API; usado para fatiar o crawl).
+        """
+        self.month_from = month_from
+        self.month_to = month_to or month_from
+        self.updated_since = updated_since
+        self.components = list(components) if components else None
+        self.phases = list(phases) if phases else None
+        self.exclude_phases = list(exclude_phases) if exclude_phases else None
+        self.created_from = created_from
+        self.created_before = created_before
+
+    @classmethod
+    def for_month(cls, month, **kwargs):
+        return cls(month_from=month, month_to=month, **kwargs)
+
+    def shape(self):
+        """Chave imutável que identifica a consulta (usada em caches)."""
+        return (
+            self.month_from,
+            self.month_to,
+            self.updated_since,
+            tuple(self.components or ()),
+            tuple(self.phases or ()),
+            tuple(self.exclude_phases or ()),
+            self.created_from,
+            self.created_before,
+        )
+
+    def to_graphql_filter(self):
+        """
+        Monta o filtro AdvancedSearch do allCards com created_from, created_before e updated_since.
+        Mês, componentes e fases não entram no filtro: são aplicados no CardStore (to_sql()).
+        :return: Dicionário do filtro ou None.
+        """
+        conditions = []
+        if self.created_from:
+            conditions.append({"field": "created_at", "operator": "gte", "value": self.created_from})
+        if self.created_before:
+            conditions.append({"field": "created_at", "operator": "lt", "value": self.created_before})
+        if self.updated_since:
+            conditions.append({"field": "updated_at", "operator": "gte", "value": self.updated_since})
+
+        if not conditions:
+            return None
+        if len(conditions) == 1:
+            return conditions[0]
+        return {"AND": conditions}
+
+    def to_sql(self):
+        """
+        Monta a cláusula WHERE (sem o filtro de pipe) para a tabela cards do CardStore.
+        :return: Tupla (cláusula, parâmetros).
+        """
+        clauses = []
+        params = []
+        if self.month_from:
+            clauses.append("created_month BETWEEN ? AND ?")
+            params.extend([self.month_from, self.month_to])
+        elif self.month_to:
+            # Intervalo aberto no início; cards sem mês (NULL nos cards, '' no rollup) ficam de fora
+            clauses.append("created_month > '' AND created_month <= ?")
+            params.append(self.month_to)
+        if self.updated_since:
+            clauses.append("updated_at >= ?")
+            params.append(self.updated_since)
+        if self.components:
+            clauses.append(f"component IN ({', '.join('?' for _ in self.components)})")
+            params.extend(self.components)
+        if self.phases:
+            clauses.append(f"phase IN ({', '.join('?' for _ in self.phases)})")
+            params.extend(self.phases)
+        if self.exclude_phases:
+            clauses.append(f"(phase IS NULL OR phase NOT IN ({', '.join('?' for _ in self.exclude_phases)}))")
+            params.extend(self.exclude_phases)
+        return " AND ".join(clauses), params
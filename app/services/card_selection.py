@@ -0,0 +1,126 @@
+from app.models.card import COMPONENT_FIELD
+
+# Trecho GraphQL de cada atributo do card (o id é sempre buscado)
+ATTRIBUTE_SELECTIONS = {
+    "title": "title",
+    "phase": "current_phase { name }",
+    "created_at": "created_at",
+    "updated_at": "updated_at",
+    "phase_history": "phases_history { phase { name } firstTimeIn lastTimeOut duration }",
+}
+
+# Atributo derivado de um campo do formulário
+COMPONENT = "component"
+
+# Valor de `fields` que pede todos os campos do formulário
+ALL_FIELDS = None
+
+# Consultas por conexão; {selection} recebe o selection set de cada card
+QUERY_TEMPLATES = {
+    "allCards": """
+query ($pipeId: ID!, $after: String, $filter: AdvancedSearch) {
+  allCards(pipeId: $pipeId, first: 300, after: $after, filter: $filter) {
+    edges {
+      node {
+        {selection}
+      }
+    }
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+  }
+}
+""",
+    # Um único card, com o pipe a que pertence
+    "card": """
+query ($cardId: ID!) {
+  card(id: $cardId) {
+    {selection}
+    pipe {
+      id
+    }
+  }
+}
+""",
+    "cards": """
+query ($pipeId: ID!, $after: String) {
+  cards(pipe_id: $pipeId, first: 300, after: $after) {
+    edges {
+      node {
+        {selection}
+      }
+    }
+    pageInfo {
+      hasNextPage
+      endCursor
+    }
+  }
+}
+""",
+}
+
+
+class CardSelection:
+    """
+    Atributos de card que um consumidor usa, traduzidos para o menor selection set GraphQL que os atende.
+    Seleções de vários consumidores são combinadas com merge(), para que uma única consulta sirva a todos.
+    O Pipefy não permite escolher campos do formulário individualmente (Card.fields vem sempre completo):
+    quando só alguns campos são pedidos, "fields" é consultado e os demais são descartados na leitura (project).
+    """
+
+    def __init__(self, attributes=(), fields=()):
+        """
+        :param attributes: Atributos usados: chaves de ATTRIBUTE_SELECTIONS e/ou "component".
+        :param fields: Nomes dos campos do formulário usados; ALL_FIELDS (None) para todos.
+        """
+        unknown = set(attributes) - set(ATTRIBUTE_SELECTIONS) - {COMPONENT}
+        if unknown:
+            raise ValueError(f"Atributos de card desconhecidos: {', '.join(sorted(unknown))}")
+        self.attributes = frozenset(attributes)
+        self.fields = ALL_FIELDS if fields is ALL_FIELDS else frozenset(fields)
+
+    def merge(self, *others):
+        """Retorna a seleção que atende a esta e às demais."""
+        attributes = set(self.attributes)
+        fields = self.fields
+        for other in others:
+            attributes |= other.attributes
+            fields = ALL_FIELDS if fields is ALL_FIELDS or other.fields is ALL_FIELDS else fields | other.fields
+        return CardSelection(attributes, fields)
+
+    def field_names(self):
+        """Campos do formulário a manter em cada card (None para todos)."""
+        if self.fields is ALL_FIELDS:
+            return None
+        return self.fields | {COMPONENT_FIELD} if COMPONENT in self.attributes else self.fields
+
+    def selection_set(self):
+        """Selection set de um node de card, com os atributos na ordem de ATTRIBUTE_SELECTIONS."""
+        parts = ["id"] + [
+            selection for attribute, selection in ATTRIBUTE_SELECTIONS.items() if attribute in self.attributes
+        ]
+        field_names = self.field_names()
+        if field_names is None or field_names:
+            parts.append("fields { name value }")
+        return "\n        ".join(parts)
+
+    def query(self, connection="allCards"):
+        """
+        Monta a consulta com o selection set desta seleção.
+        :param connection: "allCards" (aceita $filter), "cards" ou "card" (um card pelo id, sem paginação).
+        """
+        return QUERY_TEMPLATES[connection].replace("{selection}", self.selection_set())
+
+    def project(self, card):
+        """Descarta do card os campos do formulário que a seleção não usa."""
+        field_names = self.field_names()
+        if field_names is not None:
+            card.fields = {name: value for name, value in card.fields.items() if name in field_names}
+        return card
+
+    def __eq__(self, other):
+        return isinstance(other, CardSelection) and (self.attributes, self.fields) == (other.attributes, other.fields)
+
+    def __hash__(self):
+        return hash((self.attributes, self.fields))
@@ -0,0 +1,372 @@
+import json
+import sqlite3
+import threading
+from config import Config
+from app.models.card import Card
+
+
+class CardStore:
+    """
+    Armazena localmente (SQLite) os cards do Pipefy já sincronizados.
+    Os endpoints leem daqui em vez de percorrer o pipe inteiro a cada requisição.
+    """
+
+    def __init__(self, path=None):
+        self.path = path or Config.CARD_STORE_PATH
+        self._local = threading.local()
+        self._create_schema()
+
+    def _connection(self):
+        """Retorna a conexão SQLite da thread atual (sqlite3 não compartilha conexões entre threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def _create_schema(self):
+        conn = self._connection()
+        had_history = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'card_phase_history'"
+        ).fetchone()
+        conn.executescript(
+            """
+            BEGIN IMMEDIATE;
+            CREATE TABLE IF NOT EXISTS cards (
+                id TEXT PRIMARY KEY,
+                pipe_id TEXT NOT NULL,
+                title TEXT,
+                component TEXT,
+                phase TEXT,
+                created_at TEXT,
+                created_month TEXT,
+                updated_at TEXT,
+                fields TEXT
+            );
+            CREATE INDEX IF NOT EXISTS idx_cards_month ON cards (pipe_id, created_month);
+            CREATE INDEX IF NOT EXISTS idx_cards_phase ON cards (pipe_id, phase);
+            CREATE TABLE IF NOT EXISTS sync_state (
+                pipe_id TEXT PRIMARY KEY,
+                watermark TEXT,
+                synced_at TEXT,
+                reconciled_at TEXT
+            );
+            -- Última página gravada de cada fatia de uma sincronização em andamento (retomada após falha)
+            CREATE TABLE IF NOT EXISTS sync_cursors (
+                pipe_id TEXT NOT NULL,
+                shard_key TEXT NOT NULL,
+                cursor TEXT NOT NULL,
+                PRIMARY KEY (pipe_id, shard_key)
+            );
+
+            -- Contagem de cards por (mês de criação, componente, fase), mantida pelos triggers abaixo
+            -- a cada inserção, mudança de fase/componente ou exclusão. Valores nulos viram ''.
+            CREATE TABLE IF NOT EXISTS card_rollup (
+                pipe_id TEXT NOT NULL,
+                created_month TEXT NOT NULL,
+                component TEXT NOT NULL,
+                phase TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (pipe_id, created_month, component, phase)
+            );
+            CREATE TRIGGER IF NOT EXISTS cards_rollup_insert AFTER INSERT ON cards
+            BEGIN
+                INSERT INTO card_rollup (pipe_id, created_month, component, phase, count)
+                VALUES (new.pipe_id, COALESCE(new.created_month, ''), COALESCE(new.component, ''),
+                        COALESCE(new.phase, ''), 1)
+                ON CONFLICT (pipe_id, created_month, component, phase) DO UPDATE SET count = count + 1;
+            END;
+            CREATE TRIGGER IF NOT EXISTS cards_rollup_delete AFTER DELETE ON cards
+            BEGIN
+                UPDATE card_rollup SET count = count - 1
+                WHERE pipe_id = old.pipe_id AND created_month = COALESCE(old.created_month, '')
+                  AND component = COALESCE(old.component, '') AND phase = COALESCE(old.phase, '');
+                DELETE FROM card_rollup WHERE count <= 0;
+            END;
+            CREATE TRIGGER IF NOT EXISTS cards_rollup_update
+            AFTER UPDATE OF pipe_id, created_month, component, phase ON cards
+            WHEN old.pipe_id IS NOT new.pipe_id OR old.created_month IS NOT new.created_month
+              OR old.component IS NOT new.component OR old.phase IS NOT new.phase
+            BEGIN
+                UPDATE card_rollup SET count = count - 1
+                WHERE pipe_id = old.pipe_id AND created_month = COALESCE(old.created_month, '')
+                  AND component = COALESCE(old.component, '') AND phase = COALESCE(old.phase, '');
+                DELETE FROM card_rollup WHERE count <= 0;
+                INSERT INTO card_rollup (pipe_id, created_month, component, phase, count)
+                VALUES (new.pipe_id, COALESCE(new.created_month, ''), COALESCE(new.component, ''),
+                        COALESCE(new.phase, ''), 1)
+                ON CONFLICT (pipe_id, created_month, component, phase) DO UPDATE SET count = count + 1;
+            END;
+
+            -- Tempo de cada card em cada fase (phases_history do Pipefy), uma linha por card e fase
+            CREATE TABLE IF NOT EXISTS card_phase_history (
+                card_id TEXT NOT NULL,
+                phase_name TEXT NOT NULL,
+                first_time_in TEXT,
+                last_time_out TEXT,
+                duration INTEGER,
+                PRIMARY KEY (card_id, phase_name)
+            ) WITHOUT ROWID;
+            CREATE TRIGGER IF NOT EXISTS cards_history_delete AFTER DELETE ON cards
+            BEGIN
+                DELETE FROM card_phase_history WHERE card_id = old.id;
+            END;
+            COMMIT;
+            """
+        )
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(sync_state)")}
+            if "reconciled_at" not in columns:
+                # Bancos criados antes da reconciliação automática: a próxima sincronização é completa
+                conn.execute("ALTER TABLE sync_state ADD COLUMN reconciled_at TEXT")
+        # Bancos criados antes do rollup: preenche as contagens a partir dos cards já armazenados
+        self.rebuild_rollup(only_if_empty=True)
+        if not had_history:
+            # Cards sincronizados antes do histórico de fases: a próxima sincronização percorre o pipe inteiro
+            with conn:
+                conn.execute("UPDATE sync_state SET watermark = NULL")
+
+    def rebuild_rollup(self, only_if_empty=False):
+        """
+        Recalcula o rollup inteiro a partir da tabela cards (reconciliação).
+        :param only_if_empty: Só recalcula se o rollup estiver vazio e houver cards.
+        """
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            if only_if_empty:
+                has_rollup = conn.execute("SELECT 1 FROM card_rollup LIMIT 1").fetchone()
+                has_cards = conn.execute("SELECT 1 FROM cards LIMIT 1").fetchone()
+                if has_rollup or not has_cards:
+                    return
+            conn.execute("DELETE FROM card_rollup")
+            conn.execute(
+                """
+                INSERT INTO card_rollup (pipe_id, created_month, component, phase, count)
+                SELECT pipe_id, COALESCE(created_month, ''), COALESCE(component, ''), COALESCE(phase, ''), COUNT(*)
+                FROM cards
+                GROUP BY 1, 2, 3, 4
+                """
+            )
+
+    def get_watermark(self, pipe_id):
+        """Retorna o maior updated_at já sincronizado para o pipe (ou None se nunca sincronizou)."""
+        row = self._connection().execute(
+            "SELECT watermark FROM sync_state WHERE pipe_id = ?", (str(pipe_id),)
+        ).fetchone()
+        return row["watermark"] if row else None
+
+    def set_watermark(self, pipe_id, watermark, synced_at):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO sync_state (pipe_id, watermark, synced_at) VALUES (?, ?, ?) "
+                "ON CONFLICT(pipe_id) DO UPDATE SET watermark = excluded.watermark, synced_at = excluded.synced_at",
+                (str(pipe_id), watermark, synced_at),
+            )
+
+    def get_reconciled_at(self, pipe_id):
+        """
+        Retorna quando terminou a última sincronização completa do pipe que removeu os cards excluídos
+        (data ISO), ou None se ela nunca ocorreu.
+        """
+        row = self._connection().execute(
+            "SELECT reconciled_at FROM sync_state WHERE pipe_id = ?", (str(pipe_id),)
+        ).fetchone()
+        return row["reconciled_at"] if row else None
+
+    def set_reconciled_at(self, pipe_id, reconciled_at):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO sync_state (pipe_id, reconciled_at) VALUES (?, ?) "
+                "ON CONFLICT(pipe_id) DO UPDATE SET reconciled_at = excluded.reconciled_at",
+                (str(pipe_id), reconciled_at),
+            )
+
+    def get_cursor(self, pipe_id, shard_key):
+        """Retorna o endCursor da última página gravada da fatia (ou None se ela não está em andamento)."""
+        row = self._connection().execute(
+            "SELECT cursor FROM sync_cursors WHERE pipe_id = ? AND shard_key = ?", (str(pipe_id), shard_key)
+        ).fetchone()
+        return row["cursor"] if row else None
+
+    def set_cursor(self, pipe_id, shard_key, cursor):
+        conn = self._connection()
+        with conn:
+            conn.execute(
+                "INSERT INTO sync_cursors (pipe_id, shard_key, cursor) VALUES (?, ?, ?) "
+                "ON CONFLICT(pipe_id, shard_key) DO UPDATE SET cursor = excluded.cursor",
+                (str(pipe_id), shard_key, cursor),
+            )
+
+    def clear_cursor(self, pipe_id, shard_key=None):
+        """Descarta o cursor da fatia (ou de todas as fatias do pipe, se shard_key for None)."""
+        conn = self._connection()
+        with conn:
+            if shard_key is None:
+                conn.execute("DELETE FROM sync_cursors WHERE pipe_id = ?", (str(pipe_id),))
+            else:
+                conn.execute(
+                    "DELETE FROM sync_cursors WHERE pipe_id = ? AND shard_key = ?", (str(pipe_id), shard_key)
+                )
+
+    def upsert_cards(self, pipe_id, cards):
+        """
+        Insere ou atualiza os cards recebidos do Pipefy.
+        :param pipe_id: ID do pipe no Pipefy.
+        :param cards: Lista de Card já normalizados.
+        """
+        rows = [
+            (
+                card.id,
+                str(pipe_id),
+                card.title,
+                card.component,
+                card.phase,
+                card.created_at_raw,
+                card.created_month,
+                card.updated_at,
+                json.dumps(card.fields, ensure_ascii=False),
+            )
+            for card in cards
+        ]
+
+        conn = self._connection()
+        with conn:
+            conn.executemany(
+                """
+                INSERT INTO cards (id, pipe_id, title, component, phase, created_at, created_month, updated_at, fields)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET
+                    pipe_id = excluded.pipe_id,
+                    title = excluded.title,
+                    component = excluded.component,
+                    phase = excluded.phase,
+                    created_at = excluded.created_at,
+                    created_month = excluded.created_month,
+                    updated_at = excluded.updated_at,
+                    fields = excluded.fields
+                """,
+                rows,
+            )
+            # O histórico só é substituído quando veio na consulta (phase_history não é None)
+            with_history = [card for card in cards if card.phase_history is not None]
+            conn.executemany(
+                "DELETE FROM card_phase_history WHERE card_id = ?", ((card.id,) for card in with_history)
+            )
+            conn.executemany(
+                "INSERT OR REPLACE INTO card_phase_history "
+                "(card_id, phase_name, first_time_in, last_time_out, duration) VALUES (?, ?, ?, ?, ?)",
+                (
+                    (card.id, phase, first_time_in, last_time_out, duration)
+                    for card in with_history
+                    for phase, first_time_in, last_time_out, duration in card.phase_history
+                    if phase
+                ),
+            )
+
+    def delete_missing(self, pipe_id, keep_ids):
+        """Remove do armazenamento os cards que não existem mais no pipe (usado após sincronização completa)."""
+        conn = self._connection()
+        with conn:
+            conn.execute("CREATE TEMP TABLE IF NOT EXISTS keep_ids (id TEXT PRIMARY KEY)")
+            conn.execute("DELETE FROM keep_ids")
+            conn.executemany("INSERT OR IGNORE INTO keep_ids (id) VALUES (?)", ((str(i),) for i in keep_ids))
+            conn.execute(
+                "DELETE FROM cards WHERE pipe_id = ? AND id NOT IN (SELECT id FROM keep_ids)",
+                (str(pipe_id),),
+            )
+
+    def iter_cards(self, pipe_id, query=None):
+        """
+        Percorre os cards armazenados sem carregar todos em memória.
+        :param pipe_id: ID do pipe no Pipefy.
+        :param query: CardQuery com os critérios da busca (opcional).
+        :return: Gerador de Card.
+        """
+        sql = "SELECT * FROM cards WHERE pipe_id = ?"
+        params = [str(pipe_id)]
+        if query is not None:
+            clause, clause_params = query.to_sql()
+            if clause:
+                sql += f" AND {clause}"
+                params.extend(clause_params)
+        sql += " ORDER BY created_at"
+
+        for row in self._connection().execute(sql, params):
+            yield self._row_to_card(row)
+
+    def get_card(self, card_id):
+        """
+        Busca um card armazenado pelo id, qualquer que seja o pipe.
+        :return: Tupla (pipe_id, Card), ou None se o card não está no armazenamento.
+        """
+        row = self._connection().execute("SELECT * FROM cards WHERE id = ?", (str(card_id),)).fetchone()
+        return (row["pipe_id"], self._row_to_card(row)) if row else None
+
+    def query_cards(self, pipe_id, query=None):
+        """
+        Consulta os cards armazenados (veja iter_cards).
+        :return: Lista de Card.
+        """
+        return list(self.iter_cards(pipe_id, query))
+
+    def rollup_counts(self, pipe_id, query=None):
+        """
+        Consulta as contagens do rollup; o custo depende da quantidade de meses, não de cards.
+        :param pipe_id: ID do pipe no Pipefy.
+        :param query: CardQuery com mês, componentes e fases (updated_since não se aplica ao rollup).
+        :return: Lista de tuplas (mês, componente, fase, quantidade).
+        """
+        sql = "SELECT created_month, component, phase, count FROM card_rollup WHERE pipe_id = ?"
+        params = [str(pipe_id)]
+        if query is not None:
+            if query.updated_since:
+                raise ValueError("O rollup não filtra por data de atualização")
+            clause, clause_params = query.to_sql()
+            if clause:
+                sql += f" AND {clause}"
+                params.extend(clause_params)
+        sql += " ORDER BY created_month"
+
+        return [
+            (row["created_month"] or None, row["component"] or None, row["phase"] or None, row["count"])
+            for row in self._connection().execute(sql, params)
+        ]
+
+    def phase_durations(self, pipe_id, query=None):
+        """
+        Tempos de permanência já encerrados (com lastTimeOut) dos cards em cada fase.
+        :param pipe_id: ID do pipe no Pipefy.
+        :param query: CardQuery aplicada aos cards (mês de criação, componentes, fases atuais).
+        :return: Lista de tuplas (id do card, mês, componente, fase atual, fase, entrada, saída, duração em segundos).
+        """
+        sql = (
+            "SELECT cards.id, created_month, component, phase, phase_name, first_time_in, last_time_out, duration "
+            "FROM card_phase_history JOIN cards ON cards.id = card_phase_history.card_id "
+            "WHERE pipe_id = ? AND last_time_out IS NOT NULL"
+        )
+        params = [str(pipe_id)]
+        if query is not None:
+            clause, clause_params = query.to_sql()
+            if clause:
+                sql += f" AND {clause}"
+                params.extend(clause_params)
+
+        return [tuple(row) for row in self._connection().execute(sql, params)]
+
+    @staticmethod
+    def _row_to_card(row):
+        return Card(
+            id=row["id"],
+            title=row["title"],
+            phase=row["phase"],
+            created_at_raw=row["created_at"],
+            updated_at=row["updated_at"],
+            fields=json.loads(row["fields"]) if row["fields"] else {},
+        )
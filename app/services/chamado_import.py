@@ -0,0 +1,187 @@
+import codecs
+import csv
+import json
+import random
+import time
+from config import Config
+from app.models.chamado import Chamado
+from app.services import registry
+from app.services.sheet_write_queue import is_retryable
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+# Tipos de conteúdo aceitos para cada formato
+CONTENT_TYPES = {
+    "text/csv": "csv",
+    "application/csv": "csv",
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json-lines": "ndjson",
+}
+
+
+class ChamadoImportError(Exception):
+    """Falha ao gravar um lote na planilha; o resumo indica até onde a importação chegou."""
+
+    def __init__(self, message, summary):
+        super().__init__(message)
+        self.summary = summary
+
+
+def detect_format(requested=None, mimetype=None, filename=None):
+    """
+    Identifica o formato do arquivo de importação.
+    :param requested: Formato informado explicitamente (parâmetro ?format=).
+    :param mimetype: Content-Type da requisição ou do arquivo enviado.
+    :param filename: Nome do arquivo enviado (multipart), se houver.
+    :return: "csv" ou "ndjson".
+    :raises ValueError: Se não for possível identificar um formato suportado.
+    """
+    if requested:
+        if requested not in IMPORT_FORMATS:
+            raise ValueError(f"Formato inválido: {requested}. Use um de: {', '.join(IMPORT_FORMATS)}")
+        return requested
+    if filename:
+        extension = filename.rsplit(".", 1)[-1].lower()
+        if extension in ("csv", "ndjson", "jsonl"):
+            return "csv" if extension == "csv" else "ndjson"
+    if mimetype in CONTENT_TYPES:
+        return CONTENT_TYPES[mimetype]
+    raise ValueError("Formato do arquivo não identificado. Envie text/csv ou application/x-ndjson, ou use ?format=")
+
+
+def iter_csv_records(stream):
+    """
+    Lê o CSV linha a linha do stream (bytes, UTF-8, com ou sem BOM), sem carregá-lo inteiro.
+    A primeira linha é o cabeçalho, com os mesmos nomes de campo do JSON (descricaoAnalista, data, ...).
+    :return: Gerador de (número do registro, dicionário ou None, erro ou None).
+    """
+    reader = csv.DictReader(codecs.iterdecode(stream, "utf-8-sig"))
+    row_number = 0
+    try:
+        for record in reader:
+            row_number += 1
+            record.pop(None, None)  # Colunas além do cabeçalho
+            yield row_number, record, None
+    except (csv.Error, UnicodeDecodeError) as e:
+        yield row_number + 1, None, f"CSV inválido a partir deste registro; importação interrompida: {e}"
+
+
+def iter_ndjson_records(stream):
+    """
+    Lê um objeto JSON por linha do stream (bytes, UTF-8), sem carregá-lo inteiro.
+    Linhas em branco são ignoradas.
+    :return: Gerador de (número do registro, dicionário ou None, erro ou None).
+    """
+    row_number = 0
+    for line in stream:
+        if not line.strip():
+            continue
+        row_number += 1
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield row_number, None, f"JSON inválido: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield row_number, None, "Cada linha deve ser um objeto JSON"
+            continue
+        yield row_number, record, None
+
+
+class ChamadoImporter:
+    """
+    Importação de chamados em lote: valida os registros e calcula as horas por lote
+    (Chamado.compute_hours_bulk), gravando cada lote válido com uma única chamada append_rows.
+    Só um lote fica em memória por vez, qualquer que seja o tamanho do arquivo.
+    """
+
+    def __init__(self, google_sheets_service=None, batch_size=None, max_errors=None):
+        """
+        :param batch_size: Linhas por chamada append_rows (padrão: SHEETS_FLUSH_BATCH_SIZE).
+        :param max_errors: Quantidade máxima de erros listados no resultado (os demais são só contados).
+        """
+        self._google_sheets_service = google_sheets_service
+        self.batch_size = batch_size or Config.SHEETS_FLUSH_BATCH_SIZE
+        self.max_errors = Config.CHAMADOS_IMPORT_MAX_ERRORS if max_errors is None else max_errors
+
+    @property
+    def google_sheets_service(self):
+        return self._google_sheets_service or registry.get_google_sheets_service()
+
+    def import_records(self, records):
+        """
+        Importa os registros lidos por iter_csv_records/iter_ndjson_records.
+        :return: Resumo com received, imported, rejected, errors (número do registro e motivo)
+            e errors_truncated.
+        :raises ChamadoImportError: Se um lote não puder ser gravado; o resumo indica em next_row
+            o primeiro registro não processado, a partir do qual a importação pode ser retomada.
+        """
+        summary = {"received": 0, "imported": 0, "rejected": 0, "errors": [], "errors_truncated": False}
+        batch = []
+        for row_number, record, error in records:
+            summary["received"] += 1
+            if error is None:
+                try:
+                    batch.append((row_number, Chamado.from_dict(record)))
+                except ValueError as e:
+                    error = str(e)
+            if error is not None:
+                self._reject(summary, row_number, error)
+            elif len(batch) >= self.batch_size:
+                self._write_batch(batch, summary)
+                batch = []
+        if batch:
+            self._write_batch(batch, summary)
+        return summary
+
+    def _write_batch(self, batch, summary):
+        chamados = [chamado for _, chamado in batch]
+        hours, valid = Chamado.compute_hours_bulk(
+            [chamado.hora_inicial for chamado in chamados],
+            [chamado.hora_final for chamado in chamados],
+        )
+
+        rows = []
+        for (row_number, chamado), total_horas, is_valid in zip(batch, hours.tolist(), valid.tolist()):
+            if not is_valid:
+                self._reject(
+                    summary,
+                    row_number,
+                    f"Horário inválido (esperado HH:MM): horaInicial={chamado.hora_inicial!r}, "
+                    f"horaFinal={chamado.hora_final!r}",
+                )
+                continue
+            rows.append(list(chamado.to_dict(total_horas if total_horas > 0 else 0).values()))
+        if not rows:
+            return
+
+        try:
+            self._append_rows(rows)
+        except Exception as e:
+            summary["next_row"] = batch[0][0]
+            raise ChamadoImportError(f"Erro ao gravar chamados na planilha: {e}", summary)
+        summary["imported"] += len(rows)
+
+    def _append_rows(self, rows):
+        """Grava o lote, tentando de novo (com backoff exponencial) em falhas temporárias da API."""
+        attempt = 1
+        while True:
+            try:
+                self.google_sheets_service.append_chamados(rows)
+                return
+            except Exception as e:
+                if attempt >= Config.SHEETS_IMPORT_MAX_ATTEMPTS or not is_retryable(e):
+                    raise
+                delay = min(2 ** (attempt - 1), Config.SHEETS_FLUSH_MAX_BACKOFF) * random.uniform(0.5, 1.5)
+                print(f"Falha temporária ao importar chamados, nova tentativa em {delay:.1f}s: {e}")
+                time.sleep(delay)
+                attempt += 1
+
+    def _reject(self, summary, row_number, error):
+        summary["rejected"] += 1
+        if len(summary["errors"]) < self.max_errors:
+            summary["errors"].append({"row": row_number, "error": error})
+        else:
+            summary["errors_truncated"] = True
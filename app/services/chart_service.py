@@ -0,0 +1,67 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+from io import BytesIO
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Quantidade de gráficos renderizados mantidos em memória
+MAX_CACHED_CHARTS = 64
+
+
+class ChartRenderer:
+    """
+    Renderiza gráficos com a API orientada a objetos do matplotlib (Figure + FigureCanvasAgg),
+    sem o estado global do pyplot, direto para PNG em memória.
+    Gráficos idênticos (mesmos rótulos, valores, cores e títulos) são reaproveitados.
+    """
+
+    def __init__(self, max_entries=MAX_CACHED_CHARTS):
+        self.max_entries = max_entries
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def bar_chart(self, labels, values, colors, title, xlabel, ylabel, rotate_labels=False):
+        """
+        Gera um gráfico de barras.
+        :return: BytesIO com o PNG, pronto para FPDF.image().
+        """
+        labels = [str(label) for label in labels]
+        values = [float(value) for value in values]
+        colors = list(colors) if isinstance(colors, (list, tuple)) else colors
+        key = hashlib.sha256(
+            json.dumps([labels, values, colors, title, xlabel, ylabel, rotate_labels]).encode("utf-8")
+        ).hexdigest()
+
+        with self._lock:
+            png = self._cache.get(key)
+            if png is not None:
+                self._cache.move_to_end(key)
+        if png is None:
+            png = self._render_bar_chart(labels, values, colors, title, xlabel, ylabel, rotate_labels)
+            with self._lock:
+                self._cache[key] = png
+                while len(self._cache) > self.max_entries:
+                    self._cache.popitem(last=False)
+        return BytesIO(png)
+
+    @staticmethod
+    def _render_bar_chart(labels, values, colors, title, xlabel, ylabel, rotate_labels):
+        figure = Figure(figsize=(10, 6))
+        FigureCanvasAgg(figure)
+        ax = figure.add_subplot()
+        ax.bar(labels, values, color=colors)
+        ax.set_title(title)
+        ax.set_xlabel(xlabel)
+        ax.set_ylabel(ylabel)
+        if rotate_labels:
+            ax.tick_params(axis="x", labelrotation=90)
+        figure.tight_layout()
+
+        buffer = BytesIO()
+        figure.savefig(buffer, format="png")
+        return buffer.getvalue()
+
+
+chart_renderer = ChartRenderer()
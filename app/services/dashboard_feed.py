@@ -0,0 +1,174 @@
+import json
+import queue
+import threading
+from config import Config
+from app.services import registry
+from app.services.aggregation_service import CardAggregation
+from app.services.card_query import CardQuery
+
+# Cards exibidos no dashboard: suporte a sistemas ainda não concluídos
+DASHBOARD_QUERY = CardQuery(components=["Meu RH", "TOTVS Datasul"], exclude_phases=["Concluído"])
+
+# Enviado à fila de um assinante para encerrar a conexão (o EventSource reconecta e recebe um snapshot)
+_CLOSE = None
+
+
+def format_event(event, data, event_id=None):
+    """Formata uma mensagem Server-Sent Events."""
+    lines = [f"id: {event_id}"] if event_id is not None else []
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return "\n".join(lines) + "\n\n"
+
+
+class DashboardFeed:
+    """
+    Feed ao vivo do dashboard (/pipefy/stream) com um único atualizador em segundo plano por processo:
+    a cada intervalo (ou logo após um evento do webhook) ele lê os cards do dashboard, compara com o
+    estado anterior e envia a todos os assinantes somente o que mudou (contagens e cards alterados).
+    N dashboards abertos custam uma leitura por intervalo, e cada mensagem é serializada uma única vez.
+    """
+
+    def __init__(self, pipefy_service=None, interval=None):
+        """
+        :param interval: Segundos entre atualizações (padrão: PIPEFY_STREAM_INTERVAL).
+        """
+        self._pipefy_service = pipefy_service
+        self.interval = interval or Config.PIPEFY_STREAM_INTERVAL
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._subscribers = set()
+        self._thread = None
+        self._state = None
+        self._version = 0
+
+    @property
+    def pipefy_service(self):
+        return self._pipefy_service or registry.get_pipefy_service()
+
+    def subscribe(self):
+        """
+        Registra um assinante e garante que o atualizador esteja rodando.
+        :return: Fila de (versão, mensagem SSE) do assinante.
+        """
+        subscription = queue.Queue(maxsize=Config.PIPEFY_STREAM_QUEUE_SIZE)
+        with self._lock:
+            self._subscribers.add(subscription)
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+
+    def close(self):
+        """Encerra todas as conexões abertas (ex.: no desligamento do worker)."""
+        with self._lock:
+            subscribers = list(self._subscribers)
+            self._subscribers.clear()
+        for subscription in subscribers:
+            self._drain(subscription)
+            subscription.put_nowait(_CLOSE)
+        self._wake.set()
+
+    def wake(self):
+        """Antecipa a próxima atualização (ex.: após um evento do webhook)."""
+        self._wake.set()
+
+    def snapshot(self):
+        """
+        Estado completo atual, enviado a cada nova conexão (lido na hora se ainda não houver estado).
+        :return: Tupla (versão, mensagem SSE).
+        """
+        if self._state is None:
+            self.refresh()
+        with self._lock:
+            state = self._state
+            data = {
+                "version": self._version,
+                "counts": state["counts"],
+                "phases_count": state["phases_count"],
+                "cards": [json.loads(entry) for entry in state["cards"].values()],
+            }
+            return self._version, format_event("snapshot", data, self._version)
+
+    def refresh(self):
+        """Lê o estado atual do dashboard e publica a diferença para os assinantes, se houver."""
+        with self._refresh_lock:
+            cards = self.pipefy_service.get_cards(Config.PIPEFY_PIPE_ID, DASHBOARD_QUERY)
+            metrics = CardAggregation(cards).dashboard_metrics()
+            state = {
+                "counts": metrics["counts"],
+                "phases_count": metrics["phases_count"],
+                "cards": {card.id: json.dumps(card.to_edge(), ensure_ascii=False, sort_keys=True) for card in cards},
+            }
+
+            with self._lock:
+                previous = self._state
+                self._state = state
+                if previous is None:
+                    return
+                diff = self._diff(previous, state)
+                if diff is None:
+                    return
+                self._version += 1
+                diff["version"] = self._version
+                message = (self._version, format_event("diff", diff, self._version))
+                subscribers = list(self._subscribers)
+
+            for subscription in subscribers:
+                try:
+                    subscription.put_nowait(message)
+                except queue.Full:
+                    # Assinante lento demais: descarta a fila e encerra; ao reconectar ele recebe um snapshot
+                    self.unsubscribe(subscription)
+                    self._drain(subscription)
+                    subscription.put_nowait(_CLOSE)
+
+    @staticmethod
+    def _diff(previous, current):
+        """:return: Somente as contagens e os cards alterados, ou None se nada mudou."""
+        diff = {}
+        for key in ("counts", "phases_count"):
+            changed = {
+                name: current[key].get(name, 0)
+                for name in previous[key].keys() | current[key].keys()
+                if previous[key].get(name, 0) != current[key].get(name, 0)
+            }
+            if changed:
+                diff[key] = changed
+
+        upserted = [
+            json.loads(entry) for card_id, entry in current["cards"].items()
+            if previous["cards"].get(card_id) != entry
+        ]
+        removed = [card_id for card_id in previous["cards"] if card_id not in current["cards"]]
+        if upserted or removed:
+            diff["cards"] = {"upserted": upserted, "removed": removed}
+        return diff or None
+
+    @staticmethod
+    def _drain(subscription):
+        while True:
+            try:
+                subscription.get_nowait()
+            except queue.Empty:
+                return
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            with self._lock:
+                if not self._subscribers:
+                    # Sem assinantes o estado deixa de ser acompanhado: a próxima conexão relê tudo
+                    self._thread = None
+                    self._state = None
+                    return
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"Erro ao atualizar o feed do dashboard: {e}")
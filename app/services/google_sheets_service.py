@@ -1,26 +1,144 @@
+import threading
+import time
 import gspread
+from google.auth.transport.requests import Request
 from google.oauth2.service_account import Credentials
 from config import Config
+from app.services.sheet_write_queue import SheetWriteQueue
 
 class GoogleSheetsService:
     def __init__(self):
-        scopes = ['https://www.googleapis.com/auth/spreadsheets']
+        scopes = [
+            'https://www.googleapis.com/auth/spreadsheets',
+            # Permite consultar o modifiedTime da planilha no Drive para saber se ela mudou
+            'https://www.googleapis.com/auth/drive.metadata.readonly',
+        ]
         self.creds = Credentials.from_service_account_file(Config.GOOGLE_SHEETS_CREDENTIALS_FILE, scopes=scopes)
         self.client = gspread.authorize(self.creds)
-        self.sheet = self.client.open_by_key(Config.GOOGLE_SHEET_ID).sheet1
+        self.spreadsheet = self.client.open_by_key(Config.GOOGLE_SHEET_ID)
+        self.sheet = self.spreadsheet.sheet1
+
+        # Cópia local da planilha, revalidada pelo modifiedTime do Drive
+        self._lock = threading.Lock()
+        self._records = None
+        self._header = None
+        self._version = None
+        self._checked_at = 0.0
+        self._refreshed_at = 0.0
+
+        # Escritas são confirmadas ao entrar no journal local e enviadas em lote em segundo plano
+        self.write_queue = SheetWriteQueue(
+            self.sheet, on_flushed=self._on_rows_flushed, mark_started=self._write_started
+        )
+
+        # Renova o token em segundo plano para que nenhuma requisição pague a renovação
+        threading.Thread(target=self._refresh_token_loop, name="google-token-refresh", daemon=True).start()
+
+    def _refresh_token_loop(self):
+        while True:
+            time.sleep(Config.GOOGLE_TOKEN_REFRESH_INTERVAL)
+            try:
+                self.creds.refresh(Request())
+            except Exception as e:
+                print(f"Erro ao renovar o token do Google: {e}")
 
     def add_chamado(self, chamado):
-        """Adiciona um novo chamado à planilha."""
+        """Adiciona um novo chamado à fila de escrita da planilha."""
         chamado_data = chamado.to_dict()
         values = list(chamado_data.values())
         try:
-            self.sheet.append_row(values)
+            self.write_queue.enqueue(values)
         except Exception as e:
             raise Exception(f"Erro ao adicionar o chamado: {e}")
 
+    def append_chamados(self, rows):
+        """
+        Grava várias linhas na planilha em uma única chamada append_rows (sem passar pela fila).
+        Usado pela importação em lote, que precisa saber na hora se o lote foi gravado.
+        :param rows: Lista de linhas (listas de valores na ordem das colunas).
+        """
+        started = self._write_started()
+        self.sheet.append_rows(rows)
+        version = self._remote_version()
+        with self._lock:
+            self._apply_appended_rows(rows, started, version)
+
+    def _on_rows_flushed(self, entries, started):
+        """Chamado pela fila após gravar um lote: move as linhas da fila para a cópia local."""
+        version = self._remote_version()
+        with self._lock:
+            self._apply_appended_rows([entry["values"] for entry in entries], started, version)
+            self.write_queue.ack(entries)
+
+    def _write_started(self):
+        """Início de uma escrita: instante e modifiedTime da planilha antes de gravar."""
+        return time.monotonic(), self._remote_version()
+
+    def _apply_appended_rows(self, rows, started, version):
+        """
+        :param started: Retorno de _write_started() antes da escrita.
+        :param version: modifiedTime da planilha após a escrita.
+        """
+        started_at, version_before = started
+        # Se a cópia foi recarregada depois do envio, ela já contém (ou vai revalidar) essas linhas
+        if self._records is None or not self._header or self._refreshed_at >= started_at:
+            return
+        self._records.extend(self._values_to_record(values) for values in rows)
+        if version_before is not None and version_before == self._version:
+            self._version = version
+            self._checked_at = time.monotonic()
+        else:
+            # A planilha foi alterada por fora desde a última leitura: a próxima leitura baixa tudo de novo
+            self._version = None
+            self._checked_at = 0.0
+
     def get_all_chamados(self):
-        """Recupera todos os chamados registrados na planilha."""
+        """
+        Recupera todos os chamados registrados na planilha.
+        A planilha só é baixada de novo quando o modifiedTime no Drive muda; entre revalidações
+        (SHEETS_REVALIDATE_INTERVAL segundos) a cópia local é usada direto.
+        Chamados ainda na fila de escrita aparecem no fim da lista.
+        """
         try:
-            return self.sheet.get_all_records()
+            with self._lock:
+                fresh = self._is_fresh()
+            # A consulta ao Drive fica fora do lock, para não bloquear as leituras da cópia local
+            version = None if fresh else self._remote_version()
+            with self._lock:
+                if not fresh:
+                    if self._records is None or version is None or version != self._version:
+                        self._refresh(version)
+                    else:
+                        self._checked_at = time.monotonic()
+                records = [dict(record) for record in self._records]
+                records.extend(self._values_to_record(values) for values in self.write_queue.pending_values())
+                return records
         except Exception as e:
             raise Exception(f"Erro ao buscar chamados: {e}")
+
+    def _is_fresh(self):
+        """A cópia local existe e foi revalidada há menos de SHEETS_REVALIDATE_INTERVAL segundos."""
+        return self._records is not None and time.monotonic() - self._checked_at < Config.SHEETS_REVALIDATE_INTERVAL
+
+    def _refresh(self, version):
+        """
+        Baixa a planilha inteira.
+        :param version: modifiedTime consultado antes do download.
+        """
+        self._records = self.sheet.get_all_records()
+        self._header = list(self._records[0].keys()) if self._records else self.sheet.row_values(1)
+        self._version = version
+        self._checked_at = self._refreshed_at = time.monotonic()
+
+    def _remote_version(self):
+        """Retorna o modifiedTime da planilha no Drive (ou None se não for possível consultar)."""
+        try:
+            return self.spreadsheet.get_lastUpdateTime()
+        except Exception as e:
+            print(f"Não foi possível verificar a versão da planilha: {e}")
+            return None
+
+    def _values_to_record(self, values):
+        record = {name: "" for name in self._header}
+        record.update(zip(self._header, values))
+        return record
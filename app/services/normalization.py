@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+from app.models.chamado import parse_minutes_bulk
+
+# Colunas numéricas gravadas na planilha multiplicadas por 100
+SCALED_COLUMNS = ("TOTAL", "totalHoras")
+TIME_COLUMNS = ("horaInicial", "horaFinal")
+
+# Formatos aceitos na coluna "data" (input date do front-end e digitação manual)
+DATE_FORMATS = ("%Y-%m-%d", "%d/%m/%Y")
+
+
+def parse_dates(values):
+    """
+    Converte as datas dos chamados de forma vetorizada, tentando cada formato de DATE_FORMATS.
+    :return: Array datetime64 (NaT para valores inválidos).
+    """
+    text = pd.Series(values, dtype="object").astype(str).str.strip()
+    dates = pd.Series(pd.NaT, index=text.index, dtype="datetime64[ns]")
+    for date_format in DATE_FORMATS:
+        missing = dates.isna()
+        if not missing.any():
+            break
+        dates[missing] = pd.to_datetime(text[missing], format=date_format, errors="coerce")
+    return dates.to_numpy()
+
+
+def filter_chamados(records, date_from=None, date_to=None, solicitantes=None):
+    """
+    Filtra os chamados por período e solicitante.
+    :param date_from: Data inicial (datetime.date, inclusiva).
+    :param date_to: Data final (datetime.date, inclusiva).
+    :param solicitantes: Nomes dos solicitantes (sem diferenciar maiúsculas/minúsculas).
+    :return: Lista com os registros selecionados (chamados com data inválida ficam de fora
+        quando há filtro de período).
+    """
+    if not records or not (date_from or date_to or solicitantes):
+        return records
+
+    keep = np.ones(len(records), dtype=bool)
+    if date_from or date_to:
+        dates = parse_dates([record.get("data") for record in records])
+        if date_from:
+            keep &= dates >= np.datetime64(date_from)
+        if date_to:
+            keep &= dates <= np.datetime64(date_to)
+    if solicitantes:
+        wanted = {name.strip().casefold() for name in solicitantes}
+        names = pd.Series([record.get("solicitante") for record in records], dtype="object").astype(str)
+        keep &= names.str.strip().str.casefold().isin(wanted).to_numpy()
+    return [record for record, selected in zip(records, keep) if selected]
+
+
+class ChamadosTable:
+    """
+    Tabela colunar dos chamados da planilha, normalizada em uma única passada vetorizada:
+    - TOTAL e totalHoras divididos por 100 (float64, NaN quando inválidos);
+    - horaInicial e horaFinal também como minutos desde a meia-noite (int64, -1 quando inválidos).
+    """
+
+    def __init__(self, records):
+        """
+        :param records: Lista de dicionários retornada por GoogleSheetsService.get_all_chamados().
+        """
+        self.frame = pd.DataFrame.from_records(records)
+        self.scaled = {}
+        for column in SCALED_COLUMNS:
+            if column in self.frame:
+                self.scaled[column] = pd.to_numeric(self.frame[column], errors="coerce").to_numpy(dtype=np.float64) / 100
+        self.minutes = {}
+        for column in TIME_COLUMNS:
+            if column in self.frame:
+                self.minutes[column] = parse_minutes_bulk(self.frame[column].to_numpy())
+
+    def __len__(self):
+        return len(self.frame)
+
+    def display_values(self, column):
+        """
+        Valores de uma coluna escalada prontos para exibição: inteiro quando não há casas decimais,
+        arredondado em 2 casas caso contrário, None quando inválido.
+        :return: Array de objetos Python (int, float ou None).
+        """
+        values = self.scaled[column]
+        invalid = np.isnan(values)
+        is_integer = ~invalid & (values == np.floor(np.nan_to_num(values)))
+
+        display = np.round(values, 2).astype(object)
+        display[is_integer] = values[is_integer].astype(np.int64).astype(object)
+        display[invalid] = None
+        return display
+
+    def to_records(self):
+        """Registros no formato do JSON de /api/chamados, com as colunas escaladas já corrigidas."""
+        frame = self.frame.astype(object).where(self.frame.notna(), None)
+        for column in self.scaled:
+            frame[column] = self.display_values(column)
+        return frame.to_dict("records")
@@ -1,27 +1,34 @@
-import os
 from datetime import datetime
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
 from fpdf import FPDF
+from app.services.chart_service import chart_renderer
+from app.services.pdf_table import PDFTable
+
+# Colunas da tabela de chamados: (título, campo, peso da largura)
+CHAMADOS_TABLE_COLUMNS = [
+    ("Descrição Analista", "descricaoAnalista", 50),
+    ("Data", "data", 22),
+    ("Solicitante", "solicitante", 28),
+    ("Descrição", "descricaoSolicitacao", 44),
+    ("Hora Inicial", "horaInicial", 23),
+    ("Hora Final", "horaFinal", 23),
+]
 
 class PDFGenerator:
-    def __init__(self, data):
-        self.data = data
+    def __init__(self, table, filters=None):
+        """
+        :param table: ChamadosTable com os chamados da planilha.
+        :param filters: Filtros aplicados (date_from, date_to, solicitante), exibidos no relatório.
+        """
+        self.table = table
+        self.data = table.frame
+        self.filters = filters or {}
 
-    def generate_bar_chart(self, output_path, column_name, title, xlabel, ylabel):
-        """Gera um gráfico de barras e salva como imagem."""
+    def generate_bar_chart(self, column_name, title, xlabel, ylabel):
+        """Gera um gráfico de barras em memória (PNG)."""
         chart_data = self.data[column_name].value_counts()
-
-        plt.figure(figsize=(10, 6))
-        chart_data.plot(kind='bar', color='skyblue')
-        plt.title(title)
-        plt.xlabel(xlabel)
-        plt.ylabel(ylabel)
-        plt.tight_layout()
-
-        plt.savefig(output_path)
-        plt.close()
+        return chart_renderer.bar_chart(
+            chart_data.index, chart_data.values, "skyblue", title, xlabel, ylabel, rotate_labels=True
+        )
 
     def add_styled_intro_page(self, pdf):
         """Adiciona uma página inicial estilizada ao PDF."""
@@ -53,6 +60,17 @@ class PDFGenerator:
         pdf.cell(0, 10, txt=f"Relatório gerado em: {datetime.now().strftime('%d/%m/%Y')}", ln=True, align="R")
         pdf.ln(20)
 
+    def describe_filters(self):
+        """Texto com os filtros aplicados ao relatório."""
+        parts = []
+        if self.filters.get("date_from") or self.filters.get("date_to"):
+            start = self.filters.get("date_from", "início")
+            end = self.filters.get("date_to", "hoje")
+            parts.append(f"Período: {start} a {end}")
+        if self.filters.get("solicitante"):
+            parts.append(f"Solicitante: {', '.join(self.filters['solicitante'])}")
+        return " | ".join(parts)
+
     def generate_pdf(self, output_file):
         """Gera um PDF com as informações da planilha."""
         pdf = FPDF()
@@ -65,35 +83,20 @@ class PDFGenerator:
         pdf.add_page()
         pdf.set_font("Arial", style="B", size=16)
         pdf.cell(200, 10, txt="Tabela Resumo dos Chamados", ln=True, align="C")
+        if self.filters:
+            pdf.set_font("Arial", style="I", size=10)
+            pdf.cell(200, 8, txt=self.describe_filters(), ln=True, align="C")
+            pdf.set_font("Arial", style="B", size=16)
         pdf.ln(10)
 
-        try:
-            for total in self.data['TOTAL']:
-                total_value = float(total) / 100
-                total = int(total_value) if total_value.is_integer() else round(total_value, 2)
+        if "TOTAL" in self.table.scaled:
+            for total in self.table.display_values("TOTAL"):
+                if total is None:
+                    break
                 pdf.cell(200, 10, txt=f"Quantidade total de horas faturadas: {total}", ln=True, align="C")
                 pdf.ln(10)
-        except ValueError:
-            pass
-
-        pdf.set_font("Arial", size=10)
-        headers = ["Descrição Analista", "Data", "Solicitante", "Descrição", "Hora Inicial", "Hora Final"]
-        col_widths = [60, 20, 25, 50, 20, 20]
-
-        #header
-        for header, col_width in zip(headers, col_widths):
-            pdf.cell(col_width, 10, header, border=1, align="C")
-        pdf.ln()
-
-        #dados para iterar
-        for _, row in self.data.iterrows():
-            pdf.cell(60, 10, row['descricaoAnalista'], border=1)
-            pdf.cell(20, 10, row['data'], border=1)
-            pdf.cell(25, 10, row['solicitante'], border=1)
-            pdf.cell(50, 10, row['descricaoSolicitacao'], border=1)
-            pdf.cell(20, 10, row['horaInicial'], border=1)
-            pdf.cell(20, 10, row['horaFinal'], border=1)
-            pdf.ln()
+
+        PDFTable(CHAMADOS_TABLE_COLUMNS).render(pdf, self.data)
 
         #insercao do chart na page
         pdf.add_page()
@@ -101,17 +104,14 @@ class PDFGenerator:
         pdf.ln(10)
 
         #chart de barra
-        chart_path = "chart_bar.png"
-        self.generate_bar_chart(
-            chart_path,
+        chart = self.generate_bar_chart(
             column_name="solicitante",
             title="Quantidade de Chamados por Solicitante",
             xlabel="Solicitantes",
             ylabel="Quantidade de Chamados"
         )
 
-        pdf.image(chart_path, x=30, y=None, w=150)
-        os.remove(chart_path)
+        pdf.image(chart, x=30, y=None, w=150)
 
         # ultima page
         pdf.add_page()
@@ -171,6 +171,17 @@ class MonthlyPDFReport:
                 pdf.cell(0, 10, f"Fase {phase}: {count}", ln=True)
                 pdf.ln(3)
 
+            # Tempo de ciclo (SLA) dos cards concluídos, a partir do histórico de fases
+            if self.data.get("cycle_time"):
+                cycle_time = self.data["cycle_time"][0]
+                pdf.set_font("Arial", style="B", size=14)
+                pdf.cell(0, 10, "Tempo de Ciclo dos Cards Concluídos", ln=True, align="C")
+                pdf.set_font("Arial", size=12)
+                pdf.cell(0, 10, (
+                    f"Mediana: {cycle_time['p50']} h | 90% concluídos em até {cycle_time['p90']} h "
+                    f"({cycle_time['count']} cards)"
+                ), ln=True)
+
             # Títulos dos Cards Concluídos
             pdf.add_page()
             pdf.set_font("Arial", style="B", size=14)
@@ -185,28 +196,27 @@ class MonthlyPDFReport:
                 ))
                 pdf.ln(5)
 
-                # Verifica se self.data["cards"] é uma lista de dicionários
+                # Verifica se self.data["cards"] é uma lista de cards
                 if isinstance(self.data["cards"], list):
                     for card in self.data["cards"]:
                         if card:
                             pdf.multi_cell(0, 10, (
-                                f"- {card['node']['title']} (ID: {card['node']['id']})\n"
-                                f"  Link: https://app.pipefy.com/open-cards/{card['node']['id']}\n"
+                                f"- {card.title} (ID: {card.id})\n"
+                                f"  Link: https://app.pipefy.com/open-cards/{card.id}\n"
                             ))
                         else:
-                            print(f"Erro: Card não possui os campos esperados: {card["node"]}")
+                            print(f"Erro: Card não possui os campos esperados: {card}")
             else:
                 pdf.cell(0, 10, "Não há cards concluídos no mês selecionado.", ln=True)
 
             # Gráficos
             for graph in self.graphs:
-                chart_path = f"{graph['title'].replace(' ', '_')}.png"
-                self.generate_chart(graph, chart_path)
+                chart = self.generate_chart(graph)
                 pdf.add_page()
                 pdf.set_font("Arial", style="B", size=14)
                 pdf.cell(0, 10, graph["title"], ln=True, align="L")
                 pdf.ln(5)
-                pdf.image(chart_path, x=30, y=None, w=150)
+                pdf.image(chart, x=30, y=None, w=150)
 
             # Data do Relatório
             pdf.add_page()
@@ -218,14 +228,8 @@ class MonthlyPDFReport:
         except Exception as e:
             print(e)
 
-    def generate_chart(self, graph, output_path):
-        import matplotlib.pyplot as plt
-
-        plt.figure(figsize=(10, 6))
-        plt.bar(graph["labels"], graph["values"], color=graph["colors"])
-        plt.title(graph["title"])
-        plt.xlabel(graph["xlabel"])
-        plt.ylabel(graph["ylabel"])
-        plt.tight_layout()
-        plt.savefig(output_path)
-        plt.close()
\ No newline at end of file
+    def generate_chart(self, graph):
+        """Gera o gráfico de barras em memória (PNG)."""
+        return chart_renderer.bar_chart(
+            graph["labels"], graph["values"], graph["colors"], graph["title"], graph["xlabel"], graph["ylabel"]
+        )
@@ -0,0 +1,106 @@
+import numpy as np
+import pandas as pd
+
+# Indicador de texto truncado (as fontes padrão do FPDF só aceitam latin-1)
+ELLIPSIS = "..."
+
+
+class PDFTable:
+    """
+    Tabela para FPDF pensada para muitas linhas:
+    - larguras das colunas calculadas uma vez, proporcionais à largura útil da página;
+    - textos de cada coluna ajustados à largura uma vez por valor distinto (truncados com "...");
+    - linhas percorridas direto nos arrays das colunas, sem criar um objeto por linha,
+      e desenhadas com text()/line() em posições pré-calculadas;
+    - cabeçalho repetido no topo de cada nova página.
+    """
+
+    def __init__(self, columns, font_family="Arial", font_size=10, row_height=8):
+        """
+        :param columns: Lista de (título, campo do DataFrame, peso da largura).
+        :param row_height: Altura de cada linha, em mm.
+        """
+        self.columns = columns
+        self.font_family = font_family
+        self.font_size = font_size
+        self.row_height = row_height
+
+    def render(self, pdf, frame):
+        """
+        Desenha a tabela a partir da posição atual do PDF.
+        :param frame: DataFrame com os campos das colunas (campos ausentes ficam em branco).
+        """
+        widths = self._column_widths(pdf)
+        pdf.set_font(self.font_family, size=self.font_size)
+        texts = [
+            self._fit_column(pdf, frame[field] if field in frame else pd.Series([""] * len(frame)), width)
+            for (_, field, _), width in zip(self.columns, widths)
+        ]
+
+        # Posições fixas das colunas; cada célula vira um text() e cada linha uma única linha
+        # horizontal de borda (as verticais são traçadas uma vez por página), bem mais barato que cell()
+        left = pdf.l_margin
+        text_x = []
+        borders_x = [left]
+        for width in widths:
+            text_x.append(borders_x[-1] + pdf.c_margin)
+            borders_x.append(borders_x[-1] + width)
+        right = borders_x[-1]
+        baseline = self.row_height / 2 + 0.3 * pdf.font_size
+
+        self._render_header(pdf, widths)
+        top = pdf.y
+        for row in zip(*texts):
+            if pdf.will_page_break(self.row_height):
+                self._render_column_borders(pdf, borders_x, top, pdf.y)
+                pdf.add_page()
+                self._render_header(pdf, widths)
+                top = pdf.y
+            y = pdf.y
+            for x, text in zip(text_x, row):
+                pdf.text(x, y + baseline, text)
+            pdf.line(left, y + self.row_height, right, y + self.row_height)
+            pdf.set_y(y + self.row_height)
+        self._render_column_borders(pdf, borders_x, top, pdf.y)
+
+    @staticmethod
+    def _render_column_borders(pdf, borders_x, top, bottom):
+        if bottom > top:
+            for x in borders_x:
+                pdf.line(x, top, x, bottom)
+
+    def _column_widths(self, pdf):
+        total_weight = sum(weight for _, _, weight in self.columns)
+        return [pdf.epw * weight / total_weight for _, _, weight in self.columns]
+
+    def _render_header(self, pdf, widths):
+        pdf.set_font(self.font_family, style="B", size=self.font_size)
+        for (header, _, _), width in zip(self.columns, widths):
+            pdf.cell(width, self.row_height, self._fit_text(pdf, header, width), border=1, align="C")
+        pdf.ln()
+        pdf.set_font(self.font_family, size=self.font_size)
+
+    def _fit_column(self, pdf, values, width):
+        """Ajusta os textos de uma coluna, medindo cada valor distinto uma única vez."""
+        codes, uniques = pd.factorize(values.to_numpy(dtype=object))
+        # O código -1 (valor ausente) aponta para o último item: texto vazio
+        fitted = np.array([self._fit_text(pdf, value, width) for value in uniques] + [""], dtype=object)
+        return fitted[codes]
+
+    @staticmethod
+    def _fit_text(pdf, value, width):
+        text = " ".join(str(value).split())
+        text = text.encode("latin-1", "replace").decode("latin-1")
+        available = width - 2 * pdf.c_margin
+        if pdf.get_string_width(text) <= available:
+            return text
+
+        # Busca binária pelo maior prefixo que cabe junto com as reticências
+        low, high = 0, len(text)
+        while low < high:
+            middle = (low + high + 1) // 2
+            if pdf.get_string_width(text[:middle].rstrip() + ELLIPSIS) <= available:
+                low = middle
+            else:
+                high = middle - 1
+        return text[:low].rstrip() + ELLIPSIS
@@ -0,0 +1,111 @@
+import random
+import time
+from email.utils import parsedate_to_datetime
+import requests
+from requests.adapters import HTTPAdapter
+from config import Config
+from app.services.rate_limit import TokenBucket
+
+# Status HTTP que indicam falha temporária (vale tentar de novo)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+_session = None
+_budget = None
+
+
+def get_session():
+    """Retorna a sessão HTTP compartilhada (pool de conexões com keep-alive) para a API do Pipefy."""
+    global _session
+    if _session is None:
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=Config.PIPEFY_POOL_SIZE)
+        session.mount("https://", adapter)
+        session.headers.update({"Authorization": f"Bearer {Config.PIPEFY_KEY}"})
+        _session = session
+    return _session
+
+
+def get_budget():
+    """Retorna o token bucket de requisições ao Pipefy, compartilhado entre threads e workers."""
+    global _budget
+    if _budget is None:
+        _budget = TokenBucket("pipefy", Config.PIPEFY_RATE_PER_SECOND, Config.PIPEFY_RATE_BURST)
+    return _budget
+
+
+class PipefyClient:
+    """
+    Cliente GraphQL do Pipefy usado por todas as buscas da aplicação.
+    Cada requisição consome um token do orçamento compartilhado, tem timeout e, em 429/5xx ou
+    erro de rede, é repetida com backoff exponencial com jitter (respeitando o Retry-After).
+    """
+
+    def __init__(self, api_url=None, budget=None):
+        self.api_url = api_url or Config.PIPEFY_API_URL
+        self.session = get_session()
+        self.budget = budget or get_budget()
+
+    def execute(self, query, variables=None):
+        """
+        Executa uma consulta GraphQL.
+        :param query: Texto da consulta.
+        :param variables: Variáveis da consulta.
+        :return: Conteúdo de "data" da resposta.
+        """
+        attempt = 0
+        while True:
+            self.budget.acquire()
+            retry_after = None
+            rate_limited = False
+            try:
+                response = self.session.post(
+                    self.api_url,
+                    json={"query": query, "variables": variables or {}},
+                    timeout=(Config.PIPEFY_CONNECT_TIMEOUT, Config.PIPEFY_READ_TIMEOUT),
+                )
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                error = e
+            else:
+                if response.status_code not in RETRYABLE_STATUS:
+                    response.raise_for_status()
+                    data = response.json()
+                    if data.get("errors"):
+                        raise Exception(f"Erro na consulta ao Pipefy: {data['errors']}")
+                    return data["data"]
+                error = requests.exceptions.HTTPError(
+                    f"{response.status_code} ao consultar o Pipefy", response=response
+                )
+                retry_after = self._retry_after(response)
+                rate_limited = response.status_code == 429
+
+            attempt += 1
+            if attempt > Config.PIPEFY_MAX_RETRIES:
+                raise error
+            if retry_after is not None and retry_after > Config.PIPEFY_MAX_BACKOFF:
+                # Espera longa demais para segurar a requisição: falha e deixa o chamador usar os dados locais
+                raise error
+
+            delay = min(Config.PIPEFY_MAX_BACKOFF, 0.5 * 2 ** (attempt - 1)) * random.uniform(0.5, 1.5)
+            if retry_after is not None:
+                delay = max(delay, retry_after)
+            print(f"Falha temporária no Pipefy ({error}); tentativa {attempt} de {Config.PIPEFY_MAX_RETRIES} em {delay:.1f}s")
+            if rate_limited and self.budget.rate > 0:
+                # O limite é da conta: todos os workers aguardam (o próximo acquire() espera o tempo pedido)
+                self.budget.pause(delay)
+            else:
+                time.sleep(delay)
+
+    @staticmethod
+    def _retry_after(response):
+        """Segundos pedidos no cabeçalho Retry-After (número ou data HTTP), ou None."""
+        value = response.headers.get("Retry-After")
+        if not value:
+            return None
+        try:
+            return max(0.0, float(value))
+        except ValueError:
+            pass
+        try:
+            return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
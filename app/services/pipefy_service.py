@@ -1,93 +1,310 @@
+import json
+import queue
+import threading
 import requests
+from concurrent.futures import ThreadPoolExecutor
 from config import Config
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from app.models.card import Card
+from app.services.aggregation_service import CardAggregation, PhaseDurationAnalysis
+from app.services.cache import TTLCache
+from app.services.card_store import CardStore
+from app.services.card_query import CardQuery
+from app.services.card_selection import ALL_FIELDS, CardSelection
+from app.services.pipefy_client import PipefyClient
+
+# Atributos de card de que cada consumidor precisa (veja CardSelection).
+# Consultas compartilhadas por vários consumidores pedem a união das seleções.
+CONSUMER_SELECTIONS = {
+    # /pipefy/cards devolve os cards com título, fase, datas e o campo de componente
+    "cards": CardSelection(("title", "phase", "component", "created_at", "updated_at")),
+    "monthly_report": CardSelection(("title", "phase", "component", "created_at")),
+    "rollup": CardSelection(("phase", "component", "created_at")),
+    "cycle_time": CardSelection(("component", "created_at", "phase_history")),
+}
+
+# A sincronização do CardStore atende a todos os consumidores e precisa do updated_at para o watermark.
+# Os cards são gravados já projetados nela: os demais campos do formulário não são armazenados.
+SYNC_SELECTION = CardSelection(("updated_at",)).merge(*CONSUMER_SELECTIONS.values())
+SYNC_QUERY = SYNC_SELECTION.query("allCards")
+CARD_QUERY = SYNC_SELECTION.query("card")
+
+# fetch_all_cards filtra por quaisquer campos do formulário
+FETCH_ALL_QUERY = CardSelection(("title", "phase", "created_at"), fields=ALL_FIELDS).query("cards")
+
+# Com o webhook ativo as mudanças chegam por push: a sincronização incremental vira só a
+# reconciliação periódica, que recupera eventos perdidos
+SYNC_TTL = Config.PIPEFY_RECONCILE_INTERVAL if Config.PIPEFY_WEBHOOK_SECRET else Config.PIPEFY_CACHE_TTL
+
+# Compartilhados entre instâncias: várias abas do dashboard custam uma sincronização por janela de TTL
+_sync_cache = TTLCache(SYNC_TTL, Config.PIPEFY_CACHE_STALE_TTL)
+_query_cache = TTLCache(Config.PIPEFY_CACHE_TTL, Config.PIPEFY_CACHE_STALE_TTL)
+
+_END_OF_PAGES = object()
 
 class PipefyService:
-    def __init__(self):
-        self.api_url = "https://api.pipefy.com/graphql"
-        self.headers = {
-            "Authorization": f"Bearer {Config.PIPEFY_KEY}"
-        }
+    def __init__(self, card_store=None, client=None):
+        self.client = client or PipefyClient()
+        self.card_store = card_store or CardStore()
+
+    def _paginate(self, query, variables, connection, after=None, on_page=None):
+        """
+        Percorre as páginas de uma consulta paginada por cursor.
+        Uma thread busca e decodifica a próxima página assim que o endCursor é conhecido,
+        enquanto o consumidor ainda processa a página anterior.
+        :param query: Consulta GraphQL (deve aceitar a variável $after).
+        :param variables: Variáveis da consulta.
+        :param connection: Nome da conexão no retorno (ex.: "cards", "allCards").
+        :param after: Cursor a partir do qual começar (retomada); None começa do início.
+        :param on_page: Função chamada com o endCursor de cada página depois que o consumidor a processou.
+        :return: Gerador com as edges de cada página.
+        """
+        pages = queue.Queue(maxsize=Config.PIPEFY_PREFETCH_PAGES)
+        stop = threading.Event()
+
+        def put(item):
+            while not stop.is_set():
+                try:
+                    pages.put(item, timeout=0.5)
+                    return
+                except queue.Full:
+                    continue
+
+        def produce():
+            try:
+                has_next_page = True
+                after_cursor = after
+
+                while has_next_page and not stop.is_set():
+                    data = self.client.execute(query, {**variables, "after": after_cursor})
+                    cards_data = data[connection]
+                    page_info = cards_data["pageInfo"]
+                    has_next_page = page_info["hasNextPage"]
+                    after_cursor = page_info["endCursor"]
+                    put((cards_data["edges"], after_cursor))
+                put(_END_OF_PAGES)
+            except Exception as e:
+                put(e)
+
+        threading.Thread(target=produce, daemon=True).start()
+        try:
+            while True:
+                item = pages.get()
+                if item is _END_OF_PAGES:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                edges, end_cursor = item
+                yield edges
+                if on_page is not None:
+                    on_page(end_cursor)
+        finally:
+            stop.set()
+
+    def _crawl_shards(self):
+        """
+        Divide o pipe em fatias anuais de created_at (a primeira e a última abertas),
+        para que uma sincronização completa percorra as fatias em paralelo.
+        """
+        boundaries = [
+            f"{year}-01-01T00:00:00Z"
+            for year in range(Config.PIPEFY_HISTORY_START_YEAR + 1, datetime.now(timezone.utc).year + 1)
+        ]
+        starts = [None] + boundaries
+        ends = boundaries + [None]
+        return [CardQuery(created_from=start, created_before=end) for start, end in zip(starts, ends)]
+
+    def _sync_shard(self, pipe_id, query):
+        """
+        Sincroniza uma fatia do pipe, guardando o cursor de cada página gravada: se a sincronização
+        falhar no meio, a próxima tentativa continua da página seguinte em vez de recomeçar a fatia.
+        :return: (recebidos, ids vistos, maior updated_at, se a fatia foi retomada).
+        """
+        variables = {"pipeId": pipe_id, "filter": query.to_graphql_filter()}
+        shard_key = json.dumps(variables["filter"], sort_keys=True)
+        after = self.card_store.get_cursor(pipe_id, shard_key)
+        received = 0
+        seen_ids = []
+        latest = None
+        pages = 0
+
+        def save_cursor(cursor):
+            nonlocal pages
+            pages += 1
+            self.card_store.set_cursor(pipe_id, shard_key, cursor)
+
+        try:
+            for edges in self._paginate(SYNC_QUERY, variables, "allCards", after=after, on_page=save_cursor):
+                cards = [SYNC_SELECTION.project(Card.from_node(edge["node"])) for edge in edges]
+                self.card_store.upsert_cards(pipe_id, cards)
+                received += len(cards)
+                for card in cards:
+                    seen_ids.append(card.id)
+                    latest = self._latest(latest, card.updated_at)
+        except requests.exceptions.RequestException:
+            raise
+        except Exception as e:
+            if after is None or pages:
+                raise
+            # Cursor recusado pela API (ex.: expirado): descarta e recomeça a fatia do início
+            print(f"Não foi possível retomar a sincronização do cursor salvo ({e}); recomeçando a fatia")
+            self.card_store.clear_cursor(pipe_id, shard_key)
+            return self._sync_shard(pipe_id, query)
+
+        self.card_store.clear_cursor(pipe_id, shard_key)
+        return received, seen_ids, latest, after is not None
+
+    @staticmethod
+    def _latest(current, candidate):
+        if not candidate:
+            return current
+        if current is None or Card.parse_date(candidate) > Card.parse_date(current):
+            return candidate
+        return current
+
+    def sync_cards(self, pipe_id, full=False):
+        """
+        Sincroniza o armazenamento local com o Pipefy.
+        Busca apenas os cards criados ou atualizados desde a última sincronização (watermark),
+        a não ser que full=True, que refaz o pipe inteiro e remove cards excluídos.
+        Sem watermark, o pipe é percorrido em fatias de created_at em paralelo.
+        Uma fatia interrompida por falha continua, na próxima chamada, da última página gravada.
+        :param pipe_id: ID do pipe no Pipefy.
+        :param full: Força sincronização completa.
+        :return: Quantidade de cards recebidos.
+        """
+        watermark = None if full else self.card_store.get_watermark(pipe_id)
+        shards = [CardQuery(updated_since=watermark)] if watermark else self._crawl_shards()
+
+        with ThreadPoolExecutor(max_workers=min(len(shards), Config.PIPEFY_CRAWL_WORKERS)) as executor:
+            results = list(executor.map(lambda query: self._sync_shard(pipe_id, query), shards))
+
+        received = 0
+        seen_ids = []
+        latest = watermark
+        resumed = False
+        for shard_received, shard_ids, shard_latest, shard_resumed in results:
+            received += shard_received
+            seen_ids.extend(shard_ids)
+            latest = self._latest(latest, shard_latest)
+            resumed = resumed or shard_resumed
+
+        # Fatias retomadas não viram os cards das páginas anteriores à falha: só a próxima
+        # sincronização completa sem retomada remove os cards excluídos
+        synced_at = datetime.now(timezone.utc).isoformat()
+        if full and not resumed:
+            self.card_store.delete_missing(pipe_id, seen_ids)
+        self.card_store.clear_cursor(pipe_id)
+        self.card_store.set_watermark(pipe_id, latest, synced_at)
+        if full and not resumed:
+            self.card_store.set_reconciled_at(pipe_id, synced_at)
+        return received
+
+    def fetch_card(self, card_id):
+        """
+        Busca um único card direto na API, com os mesmos atributos da sincronização.
+        :return: Tupla (pipe_id, Card), ou None se o card não existe (ou foi excluído).
+        """
+        node = self.client.execute(CARD_QUERY, {"cardId": str(card_id)}).get("card")
+        if not node:
+            return None
+        return str((node.get("pipe") or {}).get("id")), SYNC_SELECTION.project(Card.from_node(node))
+
+    def invalidate_queries(self):
+        """Descarta as consultas em cache, após mudanças aplicadas direto no armazenamento local."""
+        _query_cache.invalidate()
+
+    def reconcile(self, pipe_id):
+        """
+        Reconciliação completa: refaz a sincronização do pipe inteiro (removendo cards excluídos)
+        e recalcula o rollup, corrigindo qualquer evento de webhook perdido ou aplicado fora de ordem.
+        :return: Quantidade de cards recebidos.
+        """
+        received = self.sync_cards(pipe_id, full=True)
+        self.card_store.rebuild_rollup()
+        self.invalidate_queries()
+        return received
+
+    def get_cards(self, pipe_id, query=None):
+        """
+        Retorna os cards do armazenamento local, sincronizando no máximo uma vez por janela de TTL.
+        O resultado fica em cache por (pipe_id, formato da consulta); a lista retornada é compartilhada
+        e não deve ser modificada.
+        :param pipe_id: ID do pipe no Pipefy.
+        :param query: CardQuery com os critérios da busca.
+        """
+        query = query or CardQuery()
+        return _query_cache.get_or_load(
+            (str(pipe_id), query.shape()),
+            lambda: self._load_cards(pipe_id, query),
+        )
+
+    def get_rollup(self, pipe_id, query=None):
+        """
+        Retorna as contagens por (mês, componente, fase) do rollup mantido pelo CardStore,
+        sincronizando no máximo uma vez por janela de TTL (como get_cards).
+        :param pipe_id: ID do pipe no Pipefy.
+        :param query: CardQuery com mês, componentes e fases.
+        :return: Lista de (mês, componente, fase, quantidade).
+        """
+        self._ensure_synced(pipe_id)
+        return self.card_store.rollup_counts(pipe_id, query)
+
+    def _load_cards(self, pipe_id, query):
+        self._ensure_synced(pipe_id)
+        return self.card_store.query_cards(pipe_id, query)
+
+    def _ensure_synced(self, pipe_id):
+        """
+        Sincroniza o pipe no máximo uma vez por janela de TTL. Se o Pipefy estiver indisponível
+        e o pipe já tiver sido sincronizado antes, segue com os dados locais em vez de falhar.
+        """
+        try:
+            _sync_cache.get_or_load(str(pipe_id), lambda: self._scheduled_sync(pipe_id))
+        except Exception as e:
+            if self.card_store.get_watermark(pipe_id) is None:
+                raise
+            print(f"Falha ao sincronizar o pipe {pipe_id} com o Pipefy; usando os dados locais: {e}")
+
+    def _scheduled_sync(self, pipe_id):
+        """
+        Sincronização incremental, que só vê cards criados ou alterados. A cada
+        PIPEFY_FULL_RECONCILE_INTERVAL (e na primeira sincronização) faz a reconciliação completa,
+        que também remove os cards excluídos no Pipefy. O horário fica no CardStore, comum aos workers.
+        """
+        interval = Config.PIPEFY_FULL_RECONCILE_INTERVAL
+        if interval:
+            reconciled_at = self.card_store.get_reconciled_at(pipe_id)
+            if reconciled_at is None or datetime.fromisoformat(reconciled_at) <= (
+                datetime.now(timezone.utc) - timedelta(seconds=interval)
+            ):
+                return self.reconcile(pipe_id)
+        return self.sync_cards(pipe_id)
 
     def fetch_all_cards(self, pipe_id, filters=None):
         """
         Busca todos os cards do Pipefy em um pipe específico com paginação.
         :param pipe_id: ID do pipe no Pipefy.
         :param filters: Filtros opcionais para a busca.
-        :return: Lista de cards.
-        """
-        query_template = """
-        query ($pipeId: ID!, $after: String) {
-          cards(pipe_id: $pipeId, first: 300, after: $after) {
-            edges {
-              node {
-                id
-                title
-                fields {
-                  name
-                  value
-                }
-                current_phase {
-                  name
-                }
-                created_at
-              }
-            }
-            pageInfo {
-              hasNextPage
-              endCursor
-            }
-          }
-        }
+        :return: Lista de Card.
         """
         all_cards = []
-        has_next_page = True
-        after_cursor = None
-
-        while has_next_page:
-            variables = {"pipeId": pipe_id, "after": after_cursor}
-            response = requests.post(
-                self.api_url,
-                json={"query": query_template, "variables": variables},
-                headers=self.headers,
-            )
-            response.raise_for_status()
-
-            data = response.json()
-            cards_data = data["data"]["cards"]
-            all_cards.extend(cards_data["edges"])
-            page_info = cards_data["pageInfo"]
-            has_next_page = page_info["hasNextPage"]
-            after_cursor = page_info["endCursor"]
-
-        if filters:
-            all_cards = self.filter_cards(all_cards, filters)
+        for edges in self._paginate(FETCH_ALL_QUERY, {"pipeId": pipe_id}, "cards"):
+            cards = [Card.from_node(edge["node"]) for edge in edges]
+            all_cards.extend(self.filter_cards(cards, filters) if filters else cards)
         return all_cards
 
     def filter_cards(self, cards, filters):
         """
         Filtra os cards com base nos critérios especificados.
-        :param cards: Lista de cards.
-        :param filters: Dicionário de filtros.
+        :param cards: Lista de Card.
+        :param filters: Dicionário de filtros (nome do campo -> valor).
         :return: Lista filtrada de cards.
         """
-        filtered_cards = []
-
-        for card in cards:
-            match = True
-            for field_name, field_value in filters.items():
-                field_match = any(
-                    field["name"] == field_name and field["value"] == field_value
-                    for field in card["node"]["fields"]
-                )
-                if not field_match:
-                    match = False
-                    break
-
-            if match:
-                filtered_cards.append(card)
-
-        return filtered_cards
+        return [
+            card for card in cards
+            if all(card.fields.get(field_name) == field_value for field_name, field_value in filters.items())
+        ]
 
     def get_monthly_data(self, month):
         """
@@ -99,58 +316,54 @@ class PipefyService:
         :param month: Mês no formato "YYYY-MM".
         :return: Dados e gráficos processados.
         """
-        pipe_id = 303822738
-        all_cards = self.fetch_all_cards(pipe_id)
-
-        # Filtrar por mês selecionado e critérios específicos
-        selected_month_cards = []
-        for card in all_cards:
-            card_created_at = card["node"].get("created_at")
-            if not card_created_at:
-                continue
+        pipe_id = Config.PIPEFY_PIPE_ID
 
-            # Converter e verificar o mês
-            try:
-                card_month = datetime.strptime(card_created_at, "%Y-%m-%dT%H:%M:%S%z").strftime("%Y-%m")
-            except ValueError as e:
-                print(f"Erro ao converter data para card ID {card['node']['id']}: {e}")
-                continue
-
-            if card_month != month:
-                continue
-
-            # Verificar campo "Componente -> Suporte a Sistemas"
-            if any(
-                    field["name"] == "Componente -> Suporte a Sistemas"
-                    and field["value"] in ["Meu RH", "TOTVS Datasul"]
-                    for field in card["node"]["fields"]
-            ):
-                selected_month_cards.append(card)
-
-        # Inicializar contagens
-        counts = {"Meu RH": 0, "TOTVS Datasul": 0}
-        phases_count = {}
-        concluded_cards = []
+        # Filtrar por mês selecionado e critérios específicos direto no armazenamento local
+        query = CardQuery.for_month(month, components=["Meu RH", "TOTVS Datasul"])
+        selected_month_cards = self.get_cards(pipe_id, query)
+        return self._monthly_payload(selected_month_cards, self.card_store.phase_durations(pipe_id, query))
 
-        # Processar cards filtrados
-        for card in selected_month_cards:
-            phase_name = card["node"]["current_phase"]["name"]
+    def get_monthly_data_range(self, month_from, month_to):
+        """
+        Recupera dados e gráficos do relatório mensal de vários meses com uma única consulta,
+        separando os cards por mês de criação em uma só passada.
+        :param month_from: Primeiro mês ("YYYY-MM", inclusive).
+        :param month_to: Último mês ("YYYY-MM", inclusive).
+        :return: Lista de (mês, dados, gráficos), em ordem, somente dos meses com cards.
+        """
+        query = CardQuery(month_from=month_from, month_to=month_to, components=["Meu RH", "TOTVS Datasul"])
+        cards = self.get_cards(Config.PIPEFY_PIPE_ID, query)
 
-            # Contar por fases
-            phases_count[phase_name] = phases_count.get(phase_name, 0) + 1
+        cards_by_month = {}
+        for card in cards:
+            cards_by_month.setdefault(card.created_month, []).append(card)
+        durations_by_month = {}
+        for row in self.card_store.phase_durations(Config.PIPEFY_PIPE_ID, query):
+            durations_by_month.setdefault(row[1], []).append(row)
+        return [
+            (month, *self._monthly_payload(cards_by_month[month], durations_by_month.get(month, [])))
+            for month in sorted(cards_by_month)
+        ]
 
-            # Adicionar títulos de cards concluídos que atendem aos critérios
-            if phase_name == "Concluído" and any(
-                    field["name"] == "Componente -> Suporte a Sistemas"
-                    and field["value"] in ["Meu RH", "TOTVS Datasul"]
-                    for field in card["node"]["fields"]
-            ):
-                concluded_cards.append(card["node"]["title"])
+    def get_cycle_times(self, pipe_id, query=None, by=("component", "month")):
+        """
+        Percentis do tempo em cada fase e do tempo de ciclo dos cards, a partir do histórico de fases
+        capturado na sincronização (sem consultas extras à API).
+        :param by: Dimensões do agrupamento: "component" e/ou "month".
+        :return: {"phases": [...], "cycle_time": [...]} (veja PhaseDurationAnalysis).
+        """
+        self._ensure_synced(pipe_id)
+        analysis = PhaseDurationAnalysis(self.card_store.phase_durations(pipe_id, query))
+        return {
+            "phases": analysis.phase_percentiles(by),
+            "cycle_time": analysis.cycle_time_percentiles(by),
+        }
 
-            # Contar por tipo de solicitação
-            for field in card["node"]["fields"]:
-                if field["name"] == "Componente -> Suporte a Sistemas" and field["value"] in counts:
-                    counts[field["value"]] += 1
+    def _monthly_payload(self, selected_month_cards, durations):
+        """Monta os dados e gráficos do relatório mensal a partir dos cards do mês e do histórico de fases."""
+        metrics = CardAggregation(selected_month_cards).monthly_report_metrics()
+        counts = metrics["counts"]
+        phases_count = metrics["phases_count"]
 
         # Preparar gráficos
         graphs = [
@@ -172,10 +385,25 @@ class PipefyService:
             },
         ]
 
+        # Gráfico de SLA: mediana do tempo em cada fase (somente se houver histórico de fases)
+        analysis = PhaseDurationAnalysis(durations)
+        phase_medians = analysis.phase_medians()
+        if any(phase_medians.values()):
+            graphs.append({
+                "title": "Tempo Mediano em Cada Fase (horas)",
+                "labels": list(phase_medians.keys()),
+                "values": list(phase_medians.values()),
+                "colors": ["purple", "orange", "cyan", "red"],
+                "xlabel": "Fase",
+                "ylabel": "Horas",
+            })
+
         return {
             "total_cards": len(selected_month_cards),
             "counts": counts,
             "phases_count": phases_count,
-            "concluded_titles": concluded_cards,
+            "concluded_titles": metrics["concluded_titles"],
+            "phase_medians": phase_medians,
+            "cycle_time": analysis.cycle_time_percentiles(by=()),
             "cards": selected_month_cards,
         }, graphs
\ No newline at end of file
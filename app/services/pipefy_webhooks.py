@@ -0,0 +1,105 @@
+import hashlib
+import hmac
+import json
+import sys
+from config import Config
+from app.services import registry
+from app.services.pipefy_service import SYNC_SELECTION
+
+# Eventos do Pipefy tratados pelo webhook
+WEBHOOK_ACTIONS = ("card.create", "card.move", "card.field_update")
+
+
+def verify_signature(body, signature, secret=None):
+    """
+    Confere a assinatura HMAC-SHA256 (hex) do corpo enviada pelo Pipefy no cabeçalho X-Pipefy-Signature.
+    :param body: Corpo da requisição (bytes), exatamente como recebido.
+    :param signature: Valor do cabeçalho (aceita o prefixo "sha256=").
+    :param secret: Segredo do webhook (padrão: PIPEFY_WEBHOOK_SECRET).
+    """
+    secret = secret or Config.PIPEFY_WEBHOOK_SECRET
+    if not secret or not signature:
+        return False
+    expected = hmac.new(secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature.removeprefix("sha256=").strip().lower())
+
+
+class PipefyWebhookHandler:
+    """
+    Aplica os eventos de card do webhook do Pipefy como deltas no CardStore, sem percorrer o pipe:
+    - card.move e card.field_update de um card já armazenado alteram só a fase ou o campo, sem chamar a API;
+    - card.create (ou evento de um card ainda desconhecido) busca somente aquele card.
+    O rollup acompanha pelos triggers do CardStore e as consultas em cache são descartadas.
+    O histórico de fases e o updated_at são atualizados pela sincronização incremental seguinte.
+    """
+
+    def __init__(self, pipefy_service=None, pipe_id=None):
+        self._pipefy_service = pipefy_service
+        self.pipe_id = str(pipe_id or Config.PIPEFY_PIPE_ID)
+
+    @property
+    def pipefy_service(self):
+        return self._pipefy_service or registry.get_pipefy_service()
+
+    def handle(self, payload):
+        """
+        Aplica um evento do webhook.
+        :param payload: JSON recebido ({"data": {"action": ..., "card": {...}, ...}}).
+        :return: Resumo com action, card_id e result ("applied", "fetched" ou "ignored").
+        :raises ValueError: Se o evento não tiver ação ou card.
+        """
+        data = payload.get("data") if isinstance(payload, dict) else None
+        if not isinstance(data, dict) or not data.get("action") or not (data.get("card") or {}).get("id"):
+            raise ValueError("Evento inválido: esperado {\"data\": {\"action\": ..., \"card\": {\"id\": ...}}}")
+
+        action = data["action"]
+        card_id = str(data["card"]["id"])
+        summary = {"action": action, "card_id": card_id, "result": "ignored"}
+        event_pipe_id = data["card"].get("pipe_id")
+        if action not in WEBHOOK_ACTIONS or (event_pipe_id and str(event_pipe_id) != self.pipe_id):
+            return summary
+
+        service = self.pipefy_service
+        stored = service.card_store.get_card(card_id) if action != "card.create" else None
+        if stored is None:
+            fetched = service.fetch_card(card_id)
+            if fetched is None or fetched[0] != self.pipe_id:
+                return summary
+            pipe_id, card = fetched
+            summary["result"] = "fetched"
+        else:
+            pipe_id, card = stored
+            if not self._apply_delta(card, action, data):
+                return summary
+            summary["result"] = "applied"
+
+        service.card_store.upsert_cards(pipe_id, [card])
+        service.invalidate_queries()
+        # Dashboards conectados ao feed recebem a mudança sem esperar o próximo intervalo
+        feed = registry.created_services().get("dashboard_feed")
+        if feed is not None:
+            feed.wake()
+        return summary
+
+    @staticmethod
+    def _apply_delta(card, action, data):
+        """Aplica o evento ao card armazenado. :return: False se o evento não trouxer a mudança."""
+        if action == "card.move":
+            phase = (data.get("to") or {}).get("name")
+            if not phase:
+                return False
+            card.phase = sys.intern(phase)
+            return True
+
+        field = data.get("field") or {}
+        name = field.get("label") or field.get("name")
+        if not name or "new_value" not in data:
+            return False
+        # Campos fora da seleção da sincronização não são armazenados
+        field_names = SYNC_SELECTION.field_names()
+        if field_names is not None and name not in field_names:
+            return False
+        value = data["new_value"]
+        # Campos de múltipla escolha chegam como lista; a API de cards os devolve como texto JSON
+        card.fields[name] = json.dumps(value, ensure_ascii=False) if isinstance(value, list) else value
+        return True
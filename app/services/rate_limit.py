@@ -0,0 +1,85 @@
+import sqlite3
+import threading
+import time
+from config import Config
+
+
+class TokenBucket:
+    """
+    Token bucket guardado em SQLite, compartilhado por todas as threads e processos (workers)
+    que usam o mesmo arquivo: cada requisição consome um token, reposto a `rate` por segundo
+    até `capacity`. Quando a API pede para esperar (429), pause() zera o saldo para todos.
+    """
+
+    def __init__(self, name, rate, capacity, path=None):
+        """
+        :param name: Nome do bucket (ex.: "pipefy").
+        :param rate: Tokens repostos por segundo (0 desativa o limite).
+        :param capacity: Saldo máximo (rajada permitida).
+        :param path: Arquivo SQLite (padrão: o mesmo do CardStore).
+        """
+        self.name = name
+        self.rate = rate
+        self.capacity = max(capacity, 1)
+        self.path = path or Config.CARD_STORE_PATH
+        self._local = threading.local()
+        if self.rate > 0:
+            with self._connection() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS token_buckets (name TEXT PRIMARY KEY, tokens REAL, updated_at REAL)"
+                )
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def acquire(self):
+        """Consome um token, aguardando a reposição quando o saldo acabou."""
+        if self.rate <= 0:
+            return
+        while True:
+            wait = self._take()
+            if wait <= 0:
+                return
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """Faz todos os usuários do bucket aguardarem `seconds` antes da próxima requisição."""
+        if self.rate <= 0:
+            return
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            tokens, now = self._refill(conn)
+            self._store(conn, min(tokens, 0.0) - seconds * self.rate, now)
+
+    def _take(self):
+        """:return: 0 se conseguiu o token, ou os segundos até haver um token disponível."""
+        conn = self._connection()
+        with conn:
+            conn.execute("BEGIN IMMEDIATE")
+            tokens, now = self._refill(conn)
+            if tokens >= 1:
+                self._store(conn, tokens - 1, now)
+                return 0
+            self._store(conn, tokens, now)
+            return (1 - tokens) / self.rate
+
+    def _refill(self, conn):
+        now = time.time()
+        row = conn.execute("SELECT tokens, updated_at FROM token_buckets WHERE name = ?", (self.name,)).fetchone()
+        if row is None:
+            return float(self.capacity), now
+        tokens, updated_at = row
+        return min(float(self.capacity), tokens + max(0.0, now - updated_at) * self.rate), now
+
+    def _store(self, conn, tokens, now):
+        conn.execute(
+            "INSERT INTO token_buckets (name, tokens, updated_at) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at",
+            (self.name, tokens, now),
+        )
@@ -0,0 +1,76 @@
+import threading
+
+# Serviços compartilhados pelo processo, criados somente no primeiro uso.
+# Assim importar a aplicação não faz chamadas de rede, e cada worker (após o fork do gunicorn)
+# autentica uma única vez no Google, reaproveitando o mesmo cliente e worksheet em todos os controllers.
+_services = {}
+# Um lock por serviço: a autenticação lenta no Google não atrasa a criação dos demais serviços.
+# O lock global só protege o dicionário de locks.
+_creation_locks = {}
+_lock = threading.Lock()
+
+
+def _get_or_create(name, factory):
+    service = _services.get(name)
+    if service is None:
+        with _lock:
+            creation_lock = _creation_locks.setdefault(name, threading.Lock())
+        with creation_lock:
+            service = _services.get(name)
+            if service is None:
+                service = _services[name] = factory()
+    return service
+
+
+def get_google_sheets_service():
+    def factory():
+        from app.services.google_sheets_service import GoogleSheetsService
+        return GoogleSheetsService()
+    return _get_or_create("google_sheets", factory)
+
+
+def get_pipefy_service():
+    def factory():
+        from app.services.pipefy_service import PipefyService
+        return PipefyService()
+    return _get_or_create("pipefy", factory)
+
+
+def get_report_jobs():
+    def factory():
+        from app.services.report_jobs import ReportJobService
+        return ReportJobService()
+    return _get_or_create("report_jobs", factory)
+
+
+def get_dashboard_feed():
+    def factory():
+        from app.services.dashboard_feed import DashboardFeed
+        return DashboardFeed()
+    return _get_or_create("dashboard_feed", factory)
+
+
+def created_services():
+    """Serviços já criados (usado no encerramento para liberar recursos)."""
+    with _lock:
+        return dict(_services)
+
+
+def close_dashboard_streams():
+    """Encerra as conexões do feed ao vivo, que de outra forma nunca terminam."""
+    feed = created_services().get("dashboard_feed")
+    if feed is not None:
+        feed.close()
+
+
+def shutdown_services():
+    """
+    Encerramento gracioso do processo: fecha o feed ao vivo, aguarda os relatórios em andamento
+    e esvazia a fila de gravação da planilha (o que sobrar continua no journal para o próximo início).
+    """
+    services = created_services()
+    close_dashboard_streams()
+    if "report_jobs" in services:
+        services["report_jobs"].shutdown(wait=True)
+    if "google_sheets" in services:
+        services["google_sheets"].write_queue.close()
@@ -0,0 +1,94 @@
+import hashlib
+import os
+import tempfile
+import threading
+from config import Config
+
+# Extensões dos relatórios guardados no cache (arquivos .tmp em geração são ignorados)
+CACHED_EXTENSIONS = (".pdf", ".zip")
+
+
+class ReportCache:
+    """
+    Cache em disco de relatórios já gerados (PDF, ou ZIP para lotes), endereçado pelo conteúdo:
+    a chave é um hash de (tipo do relatório, parâmetros, versão dos dados de origem).
+    Escritas são atômicas (arquivo temporário + rename) e o diretório é limitado por
+    quantidade de arquivos e tamanho total, removendo primeiro os menos usados (LRU).
+    """
+
+    def __init__(self, directory=None, max_bytes=None, max_files=None):
+        self.directory = directory or Config.REPORT_CACHE_DIR
+        self.max_bytes = max_bytes if max_bytes is not None else Config.REPORT_CACHE_MAX_BYTES
+        self.max_files = max_files if max_files is not None else Config.REPORT_CACHE_MAX_FILES
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def make_key(report_type, params, source_version):
+        """
+        :param report_type: Tipo do relatório ("monthly", "monthly_batch", "chamados").
+        :param params: Parâmetros do relatório (ex.: {"month": "2025-01"}).
+        :param source_version: Versão/fingerprint dos dados usados no relatório.
+        """
+        raw = "|".join([report_type, *(f"{k}={params[k]}" for k in sorted(params)), source_version])
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def path_for(self, key, extension="pdf"):
+        return os.path.join(self.directory, f"{key}.{extension}")
+
+    def get(self, key, extension="pdf"):
+        """Retorna o caminho do arquivo em cache ou None. O acesso atualiza a posição do arquivo no LRU."""
+        path = self.path_for(key, extension)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            return None
+        return path
+
+    def temp_path(self, extension="pdf"):
+        """Cria um arquivo temporário no diretório do cache para a geração do relatório."""
+        fd, path = tempfile.mkstemp(dir=self.directory, suffix=f".{extension}.tmp")
+        os.close(fd)
+        return path
+
+    def commit(self, temp_path, key, extension="pdf"):
+        """
+        Move o arquivo gerado para a posição definitiva de forma atômica e aplica o limite do cache.
+        :return: Caminho definitivo do arquivo.
+        """
+        path = self.path_for(key, extension)
+        os.replace(temp_path, path)
+        self.evict(keep=path)
+        return path
+
+    def discard(self, temp_path):
+        try:
+            os.remove(temp_path)
+        except FileNotFoundError:
+            pass
+
+    def evict(self, keep=None):
+        """
+        Remove os arquivos menos usados até respeitar max_files e max_bytes.
+        :param keep: Caminho que nunca é removido (o arquivo recém-gerado).
+        """
+        with self._lock:
+            entries = []
+            for name in os.listdir(self.directory):
+                if not name.endswith(CACHED_EXTENSIONS) or os.path.join(self.directory, name) == keep:
+                    continue
+                try:
+                    stat = os.stat(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, name))
+
+            entries.sort()
+            total = sum(size for _, size, _ in entries)
+            while entries and (len(entries) > self.max_files or total > self.max_bytes):
+                _, size, name = entries.pop(0)
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+                total -= size
@@ -0,0 +1,273 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import uuid
+import weakref
+import zipfile
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import date, datetime
+from config import Config
+from app.services.pdf_service import PDFGenerator, MonthlyPDFReport
+from app.services import registry
+from app.services.normalization import ChamadosTable, filter_chamados
+from app.services.report_cache import ReportCache
+
+REPORT_TYPES = ("monthly", "monthly_batch", "chamados")
+
+# Extensão do arquivo gerado por tipo de relatório (os demais são PDF)
+REPORT_EXTENSIONS = {"monthly_batch": "zip"}
+
+# Quantidade de jobs finalizados mantidos para consulta de status
+MAX_FINISHED_JOBS = 500
+
+
+class ReportDataNotFound(Exception):
+    """Não há dados de origem para o relatório solicitado."""
+
+
+def render_monthly_report(data, graphs, month, output_file):
+    """Gera o PDF mensal (executado no pool de processos)."""
+    MonthlyPDFReport(data, graphs, month).generate_pdf(output_file)
+    return output_file
+
+
+def render_chamados_report(records, filters, output_file):
+    """Gera o PDF de chamados (executado no pool de processos)."""
+    PDFGenerator(ChamadosTable(records), filters).generate_pdf(output_file)
+    return output_file
+
+
+def cards_version(cards):
+    """Versão dos dados de um relatório mensal: hash de id, fase e updated_at dos cards."""
+    digest = hashlib.sha256()
+    for key in sorted(f"{card.id}:{card.phase}:{card.updated_at}" for card in cards):
+        digest.update(key.encode("utf-8"))
+        digest.update(b"\n")
+    return digest.hexdigest()
+
+
+def records_version(records):
+    """Versão dos dados da planilha: hash do conteúdo dos registros."""
+    raw = json.dumps(records, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ReportJobService:
+    """
+    Fila de geração de relatórios em segundo plano.
+    A busca dos dados (I/O) roda em um pool de threads; a renderização (matplotlib + FPDF, CPU)
+    roda em um pool de processos. PDFs prontos ficam no ReportCache, então o mesmo relatório
+    com os mesmos dados de origem não é gerado de novo.
+    """
+
+    def __init__(self, google_sheets_service=None, pipefy_service=None, cache=None):
+        """
+        :param google_sheets_service: Serviço da planilha (padrão: o compartilhado do registry).
+        :param pipefy_service: Serviço do Pipefy (padrão: o compartilhado do registry).
+        """
+        self._google_sheets_service = google_sheets_service
+        self._pipefy_service = pipefy_service
+        self.cache = cache or ReportCache()
+        self._jobs = OrderedDict()
+        self._lock = threading.Lock()
+        self._io_pool = ThreadPoolExecutor(max_workers=Config.REPORT_WORKERS, thread_name_prefix="report-job")
+        self._render_pool = None
+        self._key_locks = weakref.WeakValueDictionary()
+
+    @property
+    def google_sheets_service(self):
+        return self._google_sheets_service or registry.get_google_sheets_service()
+
+    @property
+    def pipefy_service(self):
+        return self._pipefy_service or registry.get_pipefy_service()
+
+    def submit(self, report_type, params):
+        """
+        Enfileira um relatório.
+        :param report_type: "monthly", "monthly_batch" ou "chamados".
+        :param params: Parâmetros do relatório (ex.: {"month": "2025-01"}; {"from": "2025-01", "to": "2025-12"}
+            para "monthly_batch"; ou para "chamados" os filtros date_from, date_to e solicitante).
+        :return: Estado inicial do job.
+        """
+        if report_type not in REPORT_TYPES:
+            raise ValueError(f"Tipo de relatório inválido: {report_type}")
+
+        job_id = str(uuid.uuid4())
+        job = {
+            "id": job_id,
+            "type": report_type,
+            "params": params,
+            "status": "queued",
+            "error": None,
+            "path": None,
+            "created_at": datetime.now().isoformat(),
+        }
+        with self._lock:
+            self._jobs[job_id] = job
+            self._evict_finished()
+        self._io_pool.submit(self._run, job_id)
+        return self._public(job)
+
+    def get(self, job_id):
+        """Retorna o estado do job (ou None se não existir)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return self._public(job) if job else None
+
+    def get_path(self, job_id):
+        """Retorna o caminho do PDF de um job concluído (ou None)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            return job["path"] if job and job["status"] == "done" else None
+
+    def prepare(self, report_type, params):
+        """
+        Busca os dados de origem e calcula a chave do relatório no cache.
+        :return: Tupla (chave, função de renderização e seus argumentos).
+        :raises ReportDataNotFound: Quando não há dados para o relatório.
+        """
+        if report_type == "monthly":
+            month = params["month"]
+            data, graphs = self.pipefy_service.get_monthly_data(month)
+            if not data.get("total_cards"):
+                raise ReportDataNotFound("Nenhum dado encontrado para o mês selecionado")
+            key = self.cache.make_key(report_type, params, cards_version(data["cards"]))
+            return key, (render_monthly_report, data, graphs, month)
+
+        if report_type == "monthly_batch":
+            reports = self.pipefy_service.get_monthly_data_range(params["from"], params["to"])
+            if not reports:
+                raise ReportDataNotFound("Nenhum dado encontrado para o período selecionado")
+            # Cada mês usa a mesma chave do relatório mensal avulso, então os PDFs são compartilhados
+            months = [
+                (month, self.cache.make_key("monthly", {"month": month}, cards_version(data["cards"])), data, graphs)
+                for month, data, graphs in reports
+            ]
+            key = self.cache.make_key(report_type, params, "|".join(month_key for _, month_key, _, _ in months))
+            return key, (self._render_monthly_batch, months)
+
+        records = self.google_sheets_service.get_all_chamados()
+        if not records:
+            raise ReportDataNotFound("Nenhum dado encontrado na planilha.")
+        if params:
+            records = filter_chamados(
+                records,
+                date_from=date.fromisoformat(params["date_from"]) if params.get("date_from") else None,
+                date_to=date.fromisoformat(params["date_to"]) if params.get("date_to") else None,
+                solicitantes=params.get("solicitante"),
+            )
+            if not records:
+                raise ReportDataNotFound("Nenhum chamado encontrado para os filtros informados.")
+        # A versão considera só os chamados selecionados: mudanças fora do filtro não invalidam o PDF
+        key = self.cache.make_key(report_type, params, records_version(records))
+        return key, (render_chamados_report, records, params)
+
+    def build(self, report_type, params, prepared=None):
+        """
+        Retorna o caminho do relatório, gerando-o somente se não estiver em cache.
+        Requisições simultâneas para a mesma chave aguardam uma única geração.
+        :param prepared: Resultado de prepare(), se já calculado.
+        """
+        key, render = prepared or self.prepare(report_type, params)
+        extension = REPORT_EXTENSIONS.get(report_type, "pdf")
+        cached = self.cache.get(key, extension)
+        if cached:
+            return cached
+
+        with self._key_lock(key):
+            cached = self.cache.get(key, extension)
+            if cached:
+                return cached
+
+            function, *args = render
+            temp_path = self.cache.temp_path(extension)
+            try:
+                if function == self._render_monthly_batch:
+                    # O lote distribui os meses no pool de processos e monta o ZIP neste processo
+                    function(*args, temp_path)
+                else:
+                    self._render_pool_executor().submit(function, *args, temp_path).result()
+                if not os.path.getsize(temp_path):
+                    raise Exception("Falha ao gerar o PDF do relatório.")
+                return self.cache.commit(temp_path, key, extension)
+            finally:
+                self.cache.discard(temp_path)
+
+    def _render_monthly_batch(self, months, output_file):
+        """
+        Gera o ZIP com os relatórios mensais de um período.
+        Meses já em cache são reaproveitados; os demais são renderizados em paralelo no pool
+        de processos e também ficam no cache, servindo depois ao relatório mensal avulso.
+        :param months: Lista de (mês, chave do PDF mensal, dados, gráficos).
+        """
+        paths = {}
+        pending = {}
+        try:
+            for month, month_key, data, graphs in months:
+                cached = self.cache.get(month_key)
+                if cached:
+                    paths[month] = cached
+                    continue
+                temp_path = self.cache.temp_path()
+                future = self._render_pool_executor().submit(render_monthly_report, data, graphs, month, temp_path)
+                pending[future] = (month, month_key, temp_path)
+
+            done, _ = wait(pending)
+            for future in done:
+                future.result()
+            for future, (month, month_key, temp_path) in pending.items():
+                paths[month] = self.cache.commit(temp_path, month_key)
+
+            with zipfile.ZipFile(output_file, "w", compression=zipfile.ZIP_STORED) as archive:
+                # PDFs já são comprimidos; o ZIP só agrupa os arquivos
+                for month, _, _, _ in months:
+                    archive.write(paths[month], arcname=f"relatorio_mensal_{month}.pdf")
+        finally:
+            for _, _, temp_path in pending.values():
+                self.cache.discard(temp_path)
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def _run(self, job_id):
+        with self._lock:
+            job = self._jobs[job_id]
+            job["status"] = "running"
+        try:
+            path = self.build(job["type"], job["params"])
+            status, error = "done", None
+        except Exception as e:
+            print(f"Erro ao gerar o relatório do job {job_id}: {e}")
+            path, status, error = None, "failed", str(e)
+        with self._lock:
+            job.update(status=status, error=error, path=path, finished_at=datetime.now().isoformat())
+
+    def _render_pool_executor(self):
+        with self._lock:
+            if self._render_pool is None:
+                # "spawn" evita herdar locks de threads do servidor no fork
+                self._render_pool = ProcessPoolExecutor(
+                    max_workers=Config.REPORT_RENDER_PROCESSES,
+                    mp_context=multiprocessing.get_context("spawn"),
+                )
+            return self._render_pool
+
+    def _evict_finished(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job["status"] in ("done", "failed")]
+        for job_id in finished[:max(0, len(finished) - MAX_FINISHED_JOBS)]:
+            del self._jobs[job_id]
+
+    @staticmethod
+    def _public(job):
+        return {key: value for key, value in job.items() if key != "path"}
+
+    def shutdown(self, wait=True):
+        """Encerra os pools, aguardando os jobs em andamento quando wait=True."""
+        self._io_pool.shutdown(wait=wait)
+        if self._render_pool is not None:
+            self._render_pool.shutdown(wait=wait)
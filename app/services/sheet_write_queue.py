@@ -0,0 +1,191 @@
+import glob
+import itertools
+import json
+import os
+import random
+import threading
+import time
+import uuid
+import requests
+from config import Config
+
+# Status HTTP que indicam falha temporária da API do Google (vale tentar de novo)
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+def is_retryable(error):
+    """Indica se o erro de uma chamada à API do Google é temporário (vale tentar de novo)."""
+    status = getattr(getattr(error, "response", None), "status_code", None)
+    if status is None:
+        # Erros de rede (sem resposta HTTP) também são temporários
+        return isinstance(error, (requests.exceptions.RequestException, OSError))
+    return status in RETRYABLE_STATUS
+
+
+class SheetWriteQueue:
+    """
+    Fila de escrita (write-behind) para a planilha.
+    Cada linha é gravada em um journal local (JSON lines, com fsync) antes de a requisição ser
+    confirmada; uma thread em segundo plano junta as linhas pendentes em chamadas append_rows,
+    com nova tentativa e backoff exponencial em 429/5xx.
+    A entrega é "pelo menos uma vez": se o processo cair entre o append_rows e a limpeza do
+    journal, as linhas são reenviadas na próxima inicialização.
+    """
+
+    # Numera as filas do processo, para que cada uma tenha o seu journal
+    _instances = itertools.count()
+    _active_journals = set()
+
+    def __init__(self, sheet, on_flushed=None, journal_dir=None, mark_started=None):
+        """
+        :param sheet: Worksheet do gspread.
+        :param on_flushed: Função chamada com (entradas, início do envio) após cada lote gravado.
+            Ela deve chamar ack(entradas) para retirar as linhas da fila.
+        :param journal_dir: Diretório dos journals (um arquivo por fila de cada processo).
+        :param mark_started: Função chamada logo antes de cada envio; o retorno é o "início do envio"
+            repassado a on_flushed (padrão: time.monotonic).
+        """
+        self.sheet = sheet
+        self.on_flushed = on_flushed or (lambda entries, started_at: self.ack(entries))
+        self.mark_started = mark_started or time.monotonic
+        self.journal_dir = journal_dir or Config.SHEETS_JOURNAL_DIR
+        os.makedirs(self.journal_dir, exist_ok=True)
+        self.journal_path = os.path.join(
+            self.journal_dir, f"journal-{os.getpid()}-{next(SheetWriteQueue._instances)}.jsonl"
+        )
+
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._pending = []
+        self._adopt_orphan_journals()
+
+        self._thread = threading.Thread(target=self._run, name="sheet-write-queue", daemon=True)
+        self._thread.start()
+
+    def enqueue(self, values):
+        """Grava a linha no journal e a coloca na fila de envio."""
+        entry = {"id": str(uuid.uuid4()), "values": values}
+        with self._lock:
+            with open(self.journal_path, "a", encoding="utf-8") as journal:
+                journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+                journal.flush()
+                os.fsync(journal.fileno())
+            self._pending.append(entry)
+        self._wakeup.set()
+        return entry["id"]
+
+    def pending_values(self):
+        """Linhas ainda não gravadas na planilha (para leitura das próprias escritas)."""
+        with self._lock:
+            return [entry["values"] for entry in self._pending]
+
+    def ack(self, entries):
+        """Retira da fila (e do journal) as entradas já gravadas na planilha."""
+        ids = {entry["id"] for entry in entries}
+        with self._lock:
+            self._pending = [entry for entry in self._pending if entry["id"] not in ids]
+            self._rewrite_journal()
+
+    def flush(self):
+        """
+        Envia um lote de linhas pendentes.
+        :return: True se não sobrou nada pendente.
+        """
+        with self._lock:
+            batch = self._pending[:Config.SHEETS_FLUSH_BATCH_SIZE]
+        if not batch:
+            return True
+
+        started = self.mark_started()
+        self.sheet.append_rows([entry["values"] for entry in batch])
+        self.on_flushed(batch, started)
+        with self._lock:
+            return not self._pending
+
+    def close(self, timeout=30):
+        """Tenta esvaziar a fila antes de encerrar (as linhas restantes continuam no journal)."""
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout)
+
+    def _run(self):
+        backoff = 1.0
+        while True:
+            self._wakeup.wait(Config.SHEETS_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            try:
+                while not self.flush():
+                    pass
+                backoff = 1.0
+            except Exception as e:
+                if not is_retryable(e):
+                    self._discard_head(e)
+                    continue
+                delay = min(backoff, Config.SHEETS_FLUSH_MAX_BACKOFF) * random.uniform(0.5, 1.5)
+                print(f"Falha temporária ao gravar chamados na planilha, nova tentativa em {delay:.1f}s: {e}")
+                backoff *= 2
+                if self._stopped.wait(delay):
+                    return
+                continue
+            if self._stopped.is_set():
+                return
+
+    def _discard_head(self, error):
+        """Move o lote rejeitado pela API (erro não temporário) para um arquivo de falhas."""
+        with self._lock:
+            batch = self._pending[:Config.SHEETS_FLUSH_BATCH_SIZE]
+        print(f"Erro ao gravar {len(batch)} chamado(s) na planilha; movidos para o arquivo de falhas: {error}")
+        with open(os.path.join(self.journal_dir, "failed.jsonl"), "a", encoding="utf-8") as failed:
+            for entry in batch:
+                failed.write(json.dumps({**entry, "error": str(error)}, ensure_ascii=False) + "\n")
+        self.ack(batch)
+
+    def _rewrite_journal(self):
+        temp_path = f"{self.journal_path}.tmp"
+        with open(temp_path, "w", encoding="utf-8") as journal:
+            for entry in self._pending:
+                journal.write(json.dumps(entry, ensure_ascii=False) + "\n")
+            journal.flush()
+            os.fsync(journal.fileno())
+        os.replace(temp_path, self.journal_path)
+
+    def _adopt_orphan_journals(self):
+        """Assume os journals de processos que não existem mais (inclusive o próprio, após reinício)."""
+        claimed_paths = []
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, "journal-*.jsonl"))):
+            pid = os.path.basename(path).split("-")[1]
+            if path in SheetWriteQueue._active_journals:
+                continue
+            # Em contêineres o PID se repete entre reinícios; journal do próprio PID que não está ativo é órfão
+            if pid.isdigit() and int(pid) != os.getpid() and self._process_alive(int(pid)):
+                continue
+            claimed = f"{path}.adopting-{os.getpid()}"
+            try:
+                os.rename(path, claimed)
+            except FileNotFoundError:
+                continue
+            claimed_paths.append(claimed)
+            with open(claimed, encoding="utf-8") as journal:
+                for line in journal:
+                    try:
+                        self._pending.append(json.loads(line))
+                    except ValueError:
+                        # Linha vazia ou incompleta (queda durante a escrita)
+                        continue
+
+        with self._lock:
+            self._rewrite_journal()
+        SheetWriteQueue._active_journals.add(self.journal_path)
+        for claimed in claimed_paths:
+            os.remove(claimed)
+
+    @staticmethod
+    def _process_alive(pid):
+        try:
+            os.kill(pid, 0)
+        except ProcessLookupError:
+            return False
+        except PermissionError:
+            return True
+        return True
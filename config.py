@@ -6,4 +6,50 @@ load_dotenv()
 class Config:
     GOOGLE_SHEETS_CREDENTIALS_FILE = os.getenv('GOOGLE_SHEETS_CREDENTIALS_FILE')
     GOOGLE_SHEET_ID = os.getenv('GOOGLE_SHEET_ID')
-    PIPEFY_KEY = os.getenv('PIPEFY_KEY')
\ No newline at end of file
+    PIPEFY_KEY = os.getenv('PIPEFY_KEY')
+    PIPEFY_PIPE_ID = os.getenv('PIPEFY_PIPE_ID', '303822738')
+    PIPEFY_API_URL = os.getenv('PIPEFY_API_URL', 'https://api.pipefy.com/graphql')
+    CARD_STORE_PATH = os.getenv('CARD_STORE_PATH', 'pipefy_cards.db')
+    # Servidor de desenvolvimento (python run.py); em produção use o gunicorn (gunicorn.conf.py)
+    PORT = int(os.getenv('PORT', '5670'))
+    FLASK_DEBUG = os.getenv('FLASK_DEBUG', '0').lower() in ('1', 'true', 'yes')
+
+    PIPEFY_POOL_SIZE = int(os.getenv('PIPEFY_POOL_SIZE', '10'))
+    PIPEFY_CACHE_TTL = float(os.getenv('PIPEFY_CACHE_TTL', '30'))
+    PIPEFY_CACHE_STALE_TTL = float(os.getenv('PIPEFY_CACHE_STALE_TTL', '300'))
+    PIPEFY_PREFETCH_PAGES = int(os.getenv('PIPEFY_PREFETCH_PAGES', '2'))
+    PIPEFY_CRAWL_WORKERS = int(os.getenv('PIPEFY_CRAWL_WORKERS', '4'))
+    PIPEFY_HISTORY_START_YEAR = int(os.getenv('PIPEFY_HISTORY_START_YEAR', '2020'))
+    PIPEFY_CONNECT_TIMEOUT = float(os.getenv('PIPEFY_CONNECT_TIMEOUT', '5'))
+    PIPEFY_READ_TIMEOUT = float(os.getenv('PIPEFY_READ_TIMEOUT', '60'))
+    PIPEFY_MAX_RETRIES = int(os.getenv('PIPEFY_MAX_RETRIES', '5'))
+    PIPEFY_MAX_BACKOFF = float(os.getenv('PIPEFY_MAX_BACKOFF', '30'))
+    # Orçamento de requisições compartilhado entre workers (0 desativa)
+    PIPEFY_RATE_PER_SECOND = float(os.getenv('PIPEFY_RATE_PER_SECOND', '5'))
+    PIPEFY_RATE_BURST = int(os.getenv('PIPEFY_RATE_BURST', '10'))
+    # Segredo do webhook do Pipefy (vazio desativa o endpoint /webhooks/pipefy)
+    PIPEFY_WEBHOOK_SECRET = os.getenv('PIPEFY_WEBHOOK_SECRET', '')
+    # Com o webhook ativo, intervalo (s) da sincronização incremental que recupera eventos perdidos
+    PIPEFY_RECONCILE_INTERVAL = float(os.getenv('PIPEFY_RECONCILE_INTERVAL', '900'))
+    # Intervalo (s) da reconciliação completa automática, que remove os cards excluídos no Pipefy (0 desativa)
+    PIPEFY_FULL_RECONCILE_INTERVAL = float(os.getenv('PIPEFY_FULL_RECONCILE_INTERVAL', '86400'))
+    # Feed ao vivo do dashboard (/pipefy/stream): intervalo entre atualizações, heartbeat e fila por conexão
+    PIPEFY_STREAM_INTERVAL = float(os.getenv('PIPEFY_STREAM_INTERVAL', '5'))
+    PIPEFY_STREAM_HEARTBEAT = float(os.getenv('PIPEFY_STREAM_HEARTBEAT', '15'))
+    PIPEFY_STREAM_QUEUE_SIZE = int(os.getenv('PIPEFY_STREAM_QUEUE_SIZE', '100'))
+
+    REPORT_CACHE_DIR = os.getenv('REPORT_CACHE_DIR', 'report_cache')
+    REPORT_WORKERS = int(os.getenv('REPORT_WORKERS', '4'))
+    REPORT_RENDER_PROCESSES = int(os.getenv('REPORT_RENDER_PROCESSES', '2'))
+    REPORT_CACHE_MAX_BYTES = int(os.getenv('REPORT_CACHE_MAX_BYTES', str(500 * 1024 * 1024)))
+    REPORT_CACHE_MAX_FILES = int(os.getenv('REPORT_CACHE_MAX_FILES', '200'))
+    REPORT_BATCH_MAX_MONTHS = int(os.getenv('REPORT_BATCH_MAX_MONTHS', '24'))
+
+    SHEETS_REVALIDATE_INTERVAL = float(os.getenv('SHEETS_REVALIDATE_INTERVAL', '10'))
+    SHEETS_JOURNAL_DIR = os.getenv('SHEETS_JOURNAL_DIR', 'sheet_journal')
+    SHEETS_FLUSH_INTERVAL = float(os.getenv('SHEETS_FLUSH_INTERVAL', '2'))
+    SHEETS_FLUSH_BATCH_SIZE = int(os.getenv('SHEETS_FLUSH_BATCH_SIZE', '500'))
+    SHEETS_FLUSH_MAX_BACKOFF = float(os.getenv('SHEETS_FLUSH_MAX_BACKOFF', '60'))
+    SHEETS_IMPORT_MAX_ATTEMPTS = int(os.getenv('SHEETS_IMPORT_MAX_ATTEMPTS', '5'))
+    CHAMADOS_IMPORT_MAX_ERRORS = int(os.getenv('CHAMADOS_IMPORT_MAX_ERRORS', '100'))
+    GOOGLE_TOKEN_REFRESH_INTERVAL = float(os.getenv('GOOGLE_TOKEN_REFRESH_INTERVAL', str(45 * 60)))
@@ -0,0 +1,56 @@
+"""
+Configuração do gunicorn para produção:
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Tudo é configurável por variáveis de ambiente:
+- GUNICORN_BIND: endereço (padrão 0.0.0.0:$PORT, porta 5670).
+- GUNICORN_WORKERS: processos. Cada worker tem seus próprios caches, feed ao vivo e pool de
+  renderização de relatórios (REPORT_RENDER_PROCESSES), então o padrão é modesto.
+- GUNICORN_WORKER_CLASS: "gthread" (padrão, threads) ou "gevent" (requer o pacote gevent). Com gevent
+  as chamadas ao Pipefy e ao Google Sheets (requests) e as esperas de backoff/token bucket cedem a
+  vez a outras requisições, e cada conexão do /pipefy/stream custa um greenlet em vez de uma thread.
+- GUNICORN_THREADS: threads por worker gthread. Cada conexão aberta do /pipefy/stream ocupa uma.
+- GUNICORN_WORKER_CONNECTIONS: conexões simultâneas por worker gevent.
+- GUNICORN_TIMEOUT / GUNICORN_GRACEFUL_TIMEOUT: segundos.
+
+No desligamento (SIGTERM), cada worker para de aceitar conexões, encerra os streams do feed ao vivo,
+termina as requisições em andamento e então aguarda os jobs de relatório e esvazia a fila de
+gravação da planilha (registry.shutdown_services), dentro do GUNICORN_GRACEFUL_TIMEOUT.
+"""
+import multiprocessing
+import os
+import threading
+import time
+
+bind = os.getenv("GUNICORN_BIND", f"0.0.0.0:{os.getenv('PORT', '5670')}")
+workers = int(os.getenv("GUNICORN_WORKERS", str(min(multiprocessing.cpu_count(), 4))))
+worker_class = os.getenv("GUNICORN_WORKER_CLASS", "gthread")
+threads = int(os.getenv("GUNICORN_THREADS", "16"))
+worker_connections = int(os.getenv("GUNICORN_WORKER_CONNECTIONS", "500"))
+timeout = int(os.getenv("GUNICORN_TIMEOUT", "120"))
+graceful_timeout = int(os.getenv("GUNICORN_GRACEFUL_TIMEOUT", "120"))
+keepalive = 5
+# Vazio desativa o log de acesso
+accesslog = os.getenv("GUNICORN_ACCESS_LOG", "-") or None
+
+# O gevent precisa aplicar o monkey patching antes de a aplicação importar requests/threading:
+# a aplicação é carregada em cada worker, depois do patch
+preload_app = False
+
+
+def post_worker_init(worker):
+    # Streams SSE nunca terminam sozinhos: ao perceber o pedido de desligamento, o worker os encerra
+    # (o EventSource reconecta em outro worker) para não segurar o encerramento até o graceful_timeout
+    def watch():
+        while worker.alive:
+            time.sleep(1)
+        from app.services import registry
+        registry.close_dashboard_streams()
+
+    threading.Thread(target=watch, daemon=True).start()
+
+
+def worker_exit(server, worker):
+    from app.services import registry
+    registry.shutdown_services()
@@ -1,7 +1,11 @@
+import atexit
 from flask import Flask
+from config import Config
+from app.services import registry
 from app.routes import chamados_bp
 from app.routes import pipefy_bp
 from app.routes import report_bp
+from app.routes import webhooks_bp
 from flask_cors import CORS
 
 def create_app():
@@ -10,8 +14,10 @@ def create_app():
     app.register_blueprint(chamados_bp, url_prefix='/api')
     app.register_blueprint(pipefy_bp, url_prefix='/pipefy')
     app.register_blueprint(report_bp, url_prefix='/report')
+    app.register_blueprint(webhooks_bp, url_prefix='/webhooks')
     return app
 
 if __name__ == "__main__":
     app = create_app()
-    app.run(debug=True, port=5670)
\ No newline at end of file
+    atexit.register(registry.shutdown_services)
+    app.run(debug=Config.FLASK_DEBUG, port=Config.PORT, threaded=True)
\ No newline at end of file
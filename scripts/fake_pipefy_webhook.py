@@ -0,0 +1,61 @@
+"""
+Emissor local de eventos do webhook do Pipefy, para testar /webhooks/pipefy sem o Pipefy.
+Os eventos são assinados com o mesmo segredo configurado na aplicação (PIPEFY_WEBHOOK_SECRET).
+
+Exemplos:
+    python scripts/fake_pipefy_webhook.py move 123456 --to "Em atendimento"
+    python scripts/fake_pipefy_webhook.py field_update 123456 --field "Componente -> Suporte a Sistemas" --value "Meu RH"
+    python scripts/fake_pipefy_webhook.py create 123456
+"""
+import argparse
+import hashlib
+import hmac
+import json
+import os
+import sys
+import requests
+
+
+def build_event(args):
+    card = {"id": args.card_id, "pipe_id": args.pipe_id}
+    if args.action == "move":
+        return {"data": {"action": "card.move", "card": card, "from": {"name": args.from_phase}, "to": {"name": args.to}}}
+    if args.action == "field_update":
+        return {"data": {"action": "card.field_update", "card": card, "field": {"label": args.field}, "new_value": args.value}}
+    return {"data": {"action": "card.create", "card": card}}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Envia um evento de card assinado para o webhook da aplicação.")
+    parser.add_argument("action", choices=["create", "move", "field_update"])
+    parser.add_argument("card_id")
+    parser.add_argument("--url", default="http://localhost:5670/webhooks/pipefy")
+    parser.add_argument("--secret", default=os.getenv("PIPEFY_WEBHOOK_SECRET"))
+    parser.add_argument("--pipe-id", default=os.getenv("PIPEFY_PIPE_ID", "303822738"))
+    parser.add_argument("--to", help="Fase de destino (move)")
+    parser.add_argument("--from-phase", help="Fase de origem (move)")
+    parser.add_argument("--field", help="Nome do campo (field_update)")
+    parser.add_argument("--value", help="Novo valor do campo (field_update)")
+    args = parser.parse_args()
+
+    if not args.secret:
+        parser.error("informe --secret ou defina PIPEFY_WEBHOOK_SECRET")
+    if args.action == "move" and not args.to:
+        parser.error("move exige --to")
+    if args.action == "field_update" and not (args.field and args.value is not None):
+        parser.error("field_update exige --field e --value")
+
+    body = json.dumps(build_event(args)).encode("utf-8")
+    signature = hmac.new(args.secret.encode("utf-8"), body, hashlib.sha256).hexdigest()
+    response = requests.post(
+        args.url,
+        data=body,
+        headers={"Content-Type": "application/json", "X-Pipefy-Signature": signature},
+        timeout=30,
+    )
+    print(response.status_code, response.text)
+    return 0 if response.ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,116 @@
+"""
+Perfil de carga do servidor: várias threads repetem requisições de dashboard e/ou relatório por um
+tempo fixo e o script mostra, para cada nível de concorrência, vazão e latências.
+Use o mesmo comando contra o servidor de desenvolvimento e contra o gunicorn para compará-los
+(veja docs/production.md).
+
+Exemplos:
+    python scripts/load_profile.py --scenario dashboard --concurrency 1,8,32
+    python scripts/load_profile.py --scenario report --months 2024-01:2024-12 --concurrency 1,4
+"""
+import argparse
+import itertools
+import statistics
+import sys
+import threading
+import time
+import requests
+
+DASHBOARD_PATHS = ["/pipefy/cards?include_cards=false", "/pipefy/cards"]
+
+
+def month_range(spec):
+    """Expande "YYYY-MM:YYYY-MM" na lista de meses."""
+    start, _, end = spec.partition(":")
+    end = end or start
+    year, month = (int(part) for part in start.split("-"))
+    months = []
+    while f"{year:04d}-{month:02d}" <= end:
+        months.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def build_paths(scenario, months):
+    reports = [f"/report/generate-monthly-report?month={month}" for month in months]
+    if scenario == "dashboard":
+        return DASHBOARD_PATHS
+    if scenario == "report":
+        return reports
+    # Misto: dez requisições de dashboard para cada relatório
+    return [path for report in reports for path in DASHBOARD_PATHS * 5 + [report]]
+
+
+def run_level(base_url, paths, concurrency, duration, timeout):
+    """Executa um nível de concorrência. :return: (requisições, erros, latências em segundos)."""
+    deadline = time.monotonic() + duration
+    cycle = itertools.cycle(paths)
+    cycle_lock = threading.Lock()
+    latencies = []
+    errors = [0]
+    results_lock = threading.Lock()
+
+    def worker():
+        session = requests.Session()
+        while time.monotonic() < deadline:
+            with cycle_lock:
+                path = next(cycle)
+            started = time.perf_counter()
+            try:
+                response = session.get(base_url + path, timeout=timeout)
+                ok = response.status_code < 400
+                response.content
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with results_lock:
+                if ok:
+                    latencies.append(elapsed)
+                else:
+                    errors[0] += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return len(latencies) + errors[0], errors[0], latencies
+
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mede vazão e latência do servidor sob requisições concorrentes.")
+    parser.add_argument("--base-url", default="http://localhost:5670")
+    parser.add_argument("--scenario", choices=["dashboard", "report", "mixed"], default="dashboard")
+    parser.add_argument("--concurrency", default="1,8,32", help="Níveis de concorrência, separados por vírgula")
+    parser.add_argument("--duration", type=float, default=20, help="Segundos por nível")
+    parser.add_argument("--months", default="2024-01:2024-12", help="Meses dos relatórios (YYYY-MM:YYYY-MM)")
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--warmup", action="store_true", help="Faz uma requisição de cada caminho antes de medir")
+    args = parser.parse_args()
+
+    paths = build_paths(args.scenario, month_range(args.months))
+    if args.warmup:
+        for path in dict.fromkeys(paths):
+            requests.get(args.base_url + path, timeout=args.timeout)
+
+    print(f"cenário={args.scenario} duração={args.duration:g}s por nível, url={args.base_url}")
+    print(f"{'concorrência':>12} {'requisições':>11} {'erros':>6} {'req/s':>8} {'p50 (ms)':>9} {'p95 (ms)':>9}")
+    for concurrency in (int(level) for level in args.concurrency.split(",")):
+        total, errors, latencies = run_level(args.base_url, paths, concurrency, args.duration, args.timeout)
+        p50 = statistics.median(latencies) * 1000 if latencies else float("nan")
+        print(
+            f"{concurrency:>12} {total:>11} {errors:>6} {len(latencies) / args.duration:>8.1f} "
+            f"{p50:>9.0f} {percentile(latencies, 0.95) * 1000:>9.0f}"
+        )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
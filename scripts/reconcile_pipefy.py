@@ -0,0 +1,24 @@
+"""
+Reconciliação completa do armazenamento local com o Pipefy: refaz a sincronização do pipe inteiro,
+remove cards excluídos e recalcula o rollup, corrigindo eventos do webhook que tenham se perdido.
+A aplicação já faz isso sozinha a cada PIPEFY_FULL_RECONCILE_INTERVAL; use o script para forçar
+uma reconciliação na hora, ou via cron em horário de pouco uso com PIPEFY_FULL_RECONCILE_INTERVAL=0.
+
+    python scripts/reconcile_pipefy.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from config import Config
+from app.services.pipefy_service import PipefyService
+
+
+def main():
+    received = PipefyService().reconcile(Config.PIPEFY_PIPE_ID)
+    print(f"Reconciliação concluída: {received} cards recebidos do pipe {Config.PIPEFY_PIPE_ID}")
+
+
+if __name__ == "__main__":
+    main()
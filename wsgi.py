@@ -0,0 +1,4 @@
+"""Ponto de entrada WSGI para produção: gunicorn -c gunicorn.conf.py wsgi:app"""
+from run import create_app
+
+app = create_app()